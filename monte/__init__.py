@@ -1 +0,0 @@
-print("helloworld")
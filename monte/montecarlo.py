@@ -1,5 +1,114 @@
+import bisect
+import contextlib
+import json
+import os
+import time
+
 import numpy as np
-import pandas as pd
+
+BIT_GENERATORS = {'PCG64': np.random.PCG64, 'PCG64DXSM': np.random.PCG64DXSM, 'Philox': np.random.Philox,
+                  'SFC64': np.random.SFC64, 'MT19937': np.random.MT19937}
+
+SAMPLERS = ('auto', 'cdf', 'alias', 'fenwick')
+BLOCK_ROWS = 1 << 20
+SAVE_FORMAT_VERSION = 1
+ALIAS_MIN_FACES = 16
+FENWICK_SCALAR_BATCH = 32
+VARIANCE_REDUCTIONS = (None, 'antithetic', 'stratified')
+_EXECUTOR = None
+
+
+def _bit_generator(name):
+    """
+    Returns the numpy BitGenerator class registered in BIT_GENERATORS under name
+    """
+    if name not in BIT_GENERATORS:
+        raise ValueError("Unknown bit generator " + str(name) + ", please pick one of " + str(list(BIT_GENERATORS)))
+    return BIT_GENERATORS[name]
+
+
+def make_rng(rng=None, bit_generator='PCG64'):
+    """
+    Turns the rng argument accepted by the rolling methods into a numpy Generator.
+
+    INPUT:
+        rng: None, an int seed, a numpy SeedSequence, a numpy BitGenerator or a numpy Generator
+        bit_generator: name of the bit generator used when rng is a seed, one of BIT_GENERATORS
+
+    OUTPUT:
+        generator: numpy Generator, or None when rng is None, meaning the global numpy random state is used
+    """
+    if rng is None or isinstance(rng, np.random.Generator):
+        return rng
+    if isinstance(rng, np.random.BitGenerator):
+        return np.random.Generator(rng)
+    return np.random.Generator(_bit_generator(bit_generator)(rng))
+
+
+def _spawn_seeds(seed, count):
+    """
+    Spawns count independent SeedSequences, one per shard of a parallel or batched call, from its seed argument:
+    None, an int seed, a numpy SeedSequence, a numpy BitGenerator or a numpy Generator.
+    A Generator or BitGenerator spawns from its own SeedSequence, so that each call gets new streams.
+    """
+    if isinstance(seed, np.random.Generator):
+        seed = seed.bit_generator
+    if isinstance(seed, np.random.BitGenerator):
+        seed = seed.seed_seq
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(count)
+
+
+def _pd():
+    """
+    Returns the pandas module, importing it on first use, so that rolling dice and playing games
+    (which only need numpy) do not pay the pandas import time. The dataframe methods call it.
+    """
+    import pandas
+    return pandas
+
+
+def get_executor():
+    """
+    Returns the executor that the async methods of Game and Analyzer run their blocking work on.
+    Unless set_executor was called, this is a thread pool with one thread per CPU, created on first use.
+    """
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='monte')
+    return _EXECUTOR
+
+
+def set_executor(executor):
+    """
+    Makes the async methods of Game and Analyzer run their blocking work on executor,
+    e.g. an executor shared with the rest of a service. The previous executor is not shut down.
+    """
+    global _EXECUTOR
+    _EXECUTOR = executor
+
+
+def _uniforms(count, rng=None):
+    """
+    Draws count uniforms in [0, 1) from rng, or from the global numpy random state when rng is None
+    """
+    return np.random.random_sample(count) if rng is None else rng.random(count)
+
+
+def _reduced_uniforms(count, rng, variance_reduction):
+    """
+    Draws count uniforms in [0, 1) for one die with a variance reduction scheme of VARIANCE_REDUCTIONS.
+        - 'antithetic' pairs the first half of the draws u with 1 - u in the second half.
+        - 'stratified' puts exactly one draw in each of the count strata [i / count, (i + 1) / count),
+        in a random order, so every face is rolled in proportion to its weight up to one roll.
+    """
+    if variance_reduction == 'antithetic':
+        half = _uniforms((count + 1) // 2, rng)
+        return np.concatenate([half, np.minimum(1.0 - half, np.nextafter(1.0, 0.0))])[:count]
+    strata = np.random.permutation(count) if rng is None else rng.permutation(count)
+    return np.minimum((strata + _uniforms(count, rng)) / count, np.nextafter(1.0, 0.0))
 
 
 class Die:
@@ -14,33 +123,42 @@ class Die:
             - Our probability model for such variable is, however, very simple
             – since our weights apply to only to single events, we are assuming that the events are independent.
             This makes sense for coin tosses but not for language use.
+    Rolls are drawn with one of three sampling backends:
+            - 'cdf' locates uniform draws in the cumulative weights, O(log N) per roll and almost no setup.
+            - 'alias' uses a Walker/Vose alias table, O(1) per roll after an O(N) setup.
+            - 'fenwick' descends a Fenwick tree of the weights, O(log N) per roll, and a weight change
+            updates the tree in O(log N) instead of throwing it away, for weights that change between rolls.
+            - 'auto' (the default) picks the alias table for dice with at least ALIAS_MIN_FACES faces
+            once a roll is large enough to pay for building it (see montecarlo_benchmark.py).
     """
-    _faces = np.array([1.0], dtype=np.float)
-    _w = np.array([1.0], dtype=np.float)
-    _dice = pd.DataFrame({"face": [_faces], "weight": [_w]})
+    __slots__ = ('_faces', '_w', '_face_index', '_cdf', '_alias', '_tree', '_tree_counts', '_sampler')
 
-    def __init__(self, faces):
+    def __init__(self, faces, sampler='auto'):
         """
         This function will initialize a "dice"
         which defines a space of outcomes and the probability of each one happening
 
         INPUT:
             faces: numpy array of strings or numbers which represents a possible outcome of a dice
+            sampler: sampling backend used to roll the die, one of SAMPLERS
 
         OUTPUT:
-            Updates the dataframe attribute that represents the dice
+            Updates the face, weight and face index attributes that represent the dice
         """
         self._faces = faces
-        if self._faces.dtype in (np.short, np.ushort, np.intc, np.uintc, np.int_, np.uint, np.longlong, np.ulonglong,
-                                 np.float16, np.float, np.cfloat, np.single, np.double, np.longdouble, np.float64,
-                                 np.int64, np.string_, np.str)\
-                or self._faces.dtype.type in (np.string_, np.str_) or self._faces.dtype.kind in ('f', 'i', 'u', 'S', 'U'):
-
-            self._w = np.array([1 for i in faces.tolist()], dtype=np.float32)
-            self._dice = pd.DataFrame({"face": self._faces.tolist(), "weight": self._w.tolist()}, index=list(range(len(self._faces.tolist
-                                                                                                                       ()))))
-            if self._faces.dtype.type in (np.string_, np.str_) or self._faces.dtype.kind in ('S', 'U'):
-                self._dice['face'] = self._dice['face'].astype('string')
+        self._cdf = None
+        self._alias = None
+        self._tree = None
+        self._tree_counts = None
+        self._sampler = 'auto'
+        if sampler in SAMPLERS:
+            self._sampler = sampler
+        else:
+            print("Please pass a sampler of 'auto', 'cdf', 'alias' or 'fenwick'")
+        if self._faces.dtype.kind in ('f', 'i', 'u', 'S', 'U'):
+            self._faces = np.ascontiguousarray(faces)
+            self._w = np.ones(self._faces.shape[0], dtype=np.float64)
+            self._face_index = {face: i for i, face in enumerate(self._faces.tolist())}
         else:
             print("Please pass a numerical or string dtype numpy array")
 
@@ -56,211 +174,2088 @@ class Die:
             The dice attribute will be updated to reflect the desired face-weight combination
 
         """
-        if self._dice[self._dice['face'] == face].shape[0] > 0:
-            if type(weight) == int or type(weight) == float:
-                self._dice.loc[self._dice['face'] == face, "weight"] = float(weight)
-            elif type(weight) == str:
-                if weight.isnumeric() or weight.replace('.', '', 1).isdigit():
-                    self._dice.loc[self._dice['face'] == face, "weight"] = float(weight)
-                else:
-                    print("Weight not numerical, please enter a numerical weight")
+        self.change_weights({face: weight})
+
+    def change_weights(self, mapping):
+        """
+        Changes the weights of many faces at once, as if change_weight was called for each of them,
+        but with a single update of the sampling tables.
+
+        INPUT:
+            mapping: dict of face to desired weight
+
+        OUTPUT:
+            The dice attribute will be updated to reflect the desired face-weight combinations
+        """
+        indices, weights = [], []
+        for face, weight in mapping.items():
+            index = self._face_index.get(face)
+            if index is None:
+                print("Face value not in dictionary")
             else:
-                print("Weight not numerical, please enter a numerical weight")
+                weight = self._numeric_weight(weight)
+                if weight is not None:
+                    indices.append(index)
+                    weights.append(weight)
+        if indices:
+            self._set_weights(np.array(indices, dtype=np.int64), np.array(weights, dtype=np.float64))
+
+    @staticmethod
+    def _numeric_weight(weight):
+        """
+        Returns weight as a float, or None after printing a message when it is not a number or a numerical string,
+        or when it is negative or not finite, which no sampling table can roll
+        """
+        if type(weight) == int or type(weight) == float:
+            weight = float(weight)
+        elif type(weight) == str and (weight.isnumeric() or weight.replace('.', '', 1).isdigit()):
+            weight = float(weight)
         else:
-            print("Face value not in dictionary")
+            print("Weight not numerical, please enter a numerical weight")
+            return None
+        if not 0.0 <= weight < float('inf'):
+            print("Weight negative or not finite, please enter a non-negative weight")
+            return None
+        return weight
+
+    def _set_weights(self, indices, weights):
+        """
+        Sets the weights of the faces at indices. The Fenwick tree, when built, is updated in place
+        in O(log N) per face; the other sampling tables are dropped and rebuilt on the next roll.
+        """
+        if self._tree is not None:
+            self._fenwick_add(indices, weights - self._w[indices],
+                              (weights > 0).astype(np.int64) - (self._w[indices] > 0))
+        self._w[indices] = weights
+        self._cdf = None
+        self._alias = None
+
+    def _fenwick_tree(self):
+        """
+        Returns the Fenwick tree of the weights, building it in O(N) if needed.
+        Entry j (1-based, entry 0 unused) holds the sum of the weights of faces j - lowbit(j) to j - 1.
+        A second, integer, Fenwick tree in _tree_counts holds the number of faces with a positive weight in the same
+        ranges, so that an entry whose faces all weigh zero is exactly zero despite the rounding of in-place updates;
+        both rely on the weights never being negative, which _numeric_weight ensures.
+        """
+        if self._tree is None:
+            positions = np.arange(self._w.shape[0] + 1)
+            lower = positions - (positions & -positions)
+            sums = np.concatenate([[0.0], np.cumsum(self._w)])
+            counts = np.concatenate([[0], np.cumsum(self._w > 0)])
+            self._tree = sums - sums[lower]
+            self._tree_counts = counts - counts[lower]
+        return self._tree
+
+    def _fenwick_add(self, indices, deltas, count_deltas):
+        """
+        Adds deltas to the weights, and count_deltas to the number of positive weights, of the faces at indices
+        in the Fenwick trees, walking up every index at once; entries left without a positive weight are reset to zero
+        """
+        tree, counts = self._tree, self._tree_counts
+        if indices.shape[0] <= FENWICK_SCALAR_BATCH:
+            for index, delta, count_delta in zip(indices.tolist(), deltas.tolist(), count_deltas.tolist()):
+                position = index + 1
+                while position < tree.shape[0]:
+                    tree[position] += delta
+                    counts[position] += count_delta
+                    if counts[position] == 0:
+                        tree[position] = 0.0
+                    position += position & -position
+            return
+        positions = indices + 1
+        while positions.shape[0] > 0:
+            np.add.at(tree, positions, deltas)
+            np.add.at(counts, positions, count_deltas)
+            tree[positions[counts[positions] == 0]] = 0.0
+            positions = positions + (positions & -positions)
+            inside = positions < tree.shape[0]
+            positions, deltas, count_deltas = positions[inside], deltas[inside], count_deltas[inside]
+
+    def _fenwick_search(self, uniforms):
+        """
+        Maps uniform draws in [0, 1) to positions in the face array by descending the Fenwick tree,
+        one level for every draw at once, so a draw costs O(log N)
+        """
+        tree = self._fenwick_tree()
+        face_count = tree.shape[0] - 1
+        total, position = 0.0, face_count
+        while position > 0:
+            total, position = total + tree[position], position - (position & -position)
+        if total <= 0:
+            raise ValueError("Invalid weights: weights sum to zero")
+        step = 1 << (face_count.bit_length() - 1)
+        if uniforms.shape[0] <= FENWICK_SCALAR_BATCH:
+            return np.array([self._fenwick_descend(tree, face_count, step, uniform * total)
+                             for uniform in uniforms.tolist()], dtype=np.int64)
+        targets = uniforms * total
+        positions = np.zeros(uniforms.shape, dtype=np.int64)
+        while step > 0:
+            candidates = positions + step
+            inside = candidates <= face_count
+            below = inside & (tree[np.minimum(candidates, face_count)] <= targets)
+            targets = np.where(below, targets - tree[np.minimum(candidates, face_count)], targets)
+            positions = np.where(below, candidates, positions)
+            step >>= 1
+        # a draw rounded past the last face stays on it
+        return np.minimum(positions, face_count - 1)
+
+    @staticmethod
+    def _fenwick_descend(tree, face_count, step, target):
+        """
+        Descends the Fenwick tree for a single draw, with python scalars, which beats numpy for a few draws
+        """
+        position = 0
+        while step > 0:
+            if position + step <= face_count and tree[position + step] <= target:
+                position += step
+                target -= tree[position]
+            step >>= 1
+        return min(position, face_count - 1)
 
-    def roll(self, roll_count=1):
+    def _cumulative_weights(self):
         """
-        Chooses faces based on the probability weights. Returns the number of faces defined in roll_count in a list.
+        Returns the normalized cumulative weights of the faces.
+        The array is cached and only rebuilt after a weight has been changed.
+
+        OUTPUT:
+            cdf: float64 numpy array, increasing from the first face to 1.0 at the last face
+        """
+        if self._cdf is None:
+            cdf = np.cumsum(self._w)
+            if cdf[-1] <= 0:
+                raise ValueError("Invalid weights: weights sum to zero")
+            cdf /= cdf[-1]
+            cdf[-1] = 1.0
+            self._cdf = cdf
+        return self._cdf
+
+    def _roll_indices(self, roll_count, rng=None):
+        """
+        Draws roll_count rolls as positions in the face array, so callers can keep integer codes instead of faces
+
+        INPUT:
+            roll_count: number of rolls
+            rng: numpy Generator to draw from, defaults to the global numpy random state
+
+        OUTPUT:
+            indices: int numpy array of positions in _faces
+        """
+        uniforms = _uniforms(roll_count, rng)
+        if self._sampler == 'fenwick':
+            return self._fenwick_search(uniforms)
+        if self._use_alias(roll_count):
+            prob, alias = self._alias_table()
+            scaled = uniforms * prob.shape[0]
+            indices = scaled.astype(np.int64)
+            return np.where(scaled - indices < prob[indices], indices, alias[indices])
+        return self._inverse_cdf(uniforms)
+
+    def _inverse_cdf(self, uniforms):
+        """
+        Maps uniform draws in [0, 1) to positions in the face array through the cumulative weights.
+        The mapping is monotone, so antithetic or stratified uniforms keep their structure as faces.
+        """
+        return np.searchsorted(self._cumulative_weights(), uniforms, side='right')
+
+    def _use_alias(self, roll_count):
+        """
+        Decides whether a roll of roll_count uses the alias table or the cumulative weights
+        """
+        if self._sampler == 'auto':
+            face_count = self._faces.shape[0]
+            return face_count >= ALIAS_MIN_FACES and (self._alias is not None or roll_count >= face_count)
+        return self._sampler == 'alias'
+
+    def _alias_table(self):
+        """
+        Returns the Walker/Vose alias table of the weights, building it if a weight has changed since the last build.
+        A roll picks a face i uniformly, keeps it with probability prob[i] and otherwise takes alias[i].
+        The weights are never negative (see _numeric_weight), which the pairing of small and large faces relies on.
+
+        OUTPUT:
+            prob: float64 numpy array of the probability of keeping each face
+            alias: int64 numpy array of the face taken instead of each face
+        """
+        if self._alias is None:
+            if self._w.sum() <= 0:
+                raise ValueError("Invalid weights: weights sum to zero")
+            face_count = self._w.shape[0]
+            scaled = (self._w * (face_count / self._w.sum())).tolist()
+            prob = np.ones(face_count, dtype=np.float64)
+            alias = np.arange(face_count, dtype=np.int64)
+            small = [i for i in range(face_count) if scaled[i] < 1.0]
+            large = [i for i in range(face_count) if scaled[i] >= 1.0]
+            while small and large:
+                less, more = small.pop(), large[-1]
+                prob[less] = scaled[less]
+                alias[less] = more
+                scaled[more] = scaled[more] - (1.0 - scaled[less])
+                if scaled[more] < 1.0:
+                    small.append(large.pop())
+            # faces left over only because of rounding keep prob 1, except faces that cannot be rolled at all
+            zero = self._w <= 0
+            prob[zero] = 0.0
+            alias[zero & (alias == np.arange(face_count))] = int(np.argmax(self._w))
+            self._alias = (prob, alias)
+        return self._alias
+
+    def roll(self, roll_count=1, as_list=False, rng=None, bit_generator='PCG64'):
+        """
+        Chooses faces based on the probability weights. Returns the number of faces defined in roll_count.
+        All of the rolls are drawn in one vectorized pass: uniform draws are located in the cumulative weights,
+        so a face with a weight of 0 can never be chosen.
 
         INPUT:
-            rollCount: number of faces to return (number of rolls)
+            roll_count: number of faces to return (number of rolls)
+            as_list: True returns the outcomes as a python list instead of a numpy array
+            rng: numpy Generator or seed to draw from (see make_rng), defaults to the global numpy random state
+            bit_generator: bit generator used when rng is a seed, e.g. 'PCG64', 'Philox' or 'SFC64'
 
         OUTPUT:
-            outcomes: list of results with the result count = rowCount parameter
+            outcomes: numpy array (or list) of results with the result count = roll_count parameter
         """
-        outcomes = []
-        print(self._dice.sample(n=1, weights=self._dice['weight'].to_numpy())['face'].values[0])
-        for i in range(roll_count):
-            outcomes.append(self._dice.sample(n=1, weights=self._dice['weight'].to_numpy())['face'].values[0])
+        outcomes = self._faces[self._roll_indices(roll_count, make_rng(rng, bit_generator))]
+        if as_list:
+            return outcomes.tolist()
         return outcomes
 
     def show(self):
         """
-        Returns the faces, weights dice dataframe
+        Returns the faces, weights dice dataframe.
+        The dataframe is built from the face and weight arrays each time it is asked for.
         OUTPUT:
             dice: faces, weight dataframe
         """
+        dice = _pd().DataFrame({"face": self._faces.tolist(), "weight": self._w.tolist()},
+                               index=list(range(self._faces.shape[0])))
+        if self._faces.dtype.kind in ('S', 'U'):
+            dice['face'] = dice['face'].astype('string')
+        return dice
 
-        return self._dice
+    @property
+    def _dice(self):
+        """
+        The faces, weights dice dataframe, kept for code written against the old dataframe attribute
+        """
+        return self.show()
 
 
-class Game:
+class MarkovDie(Die):
     """
-        A game consists of rolling of one or more dice of the same kind one or more times.
-        Each game is initialized with one or more of similarly defined dice (Die objects).
-        By “same kind” and “similarly defined” we mean that each die in a given game has...
-        the same number of sides and associated faces,
-        but each die object may have its own weights.
-        The class has a behavior to play a game, i.e. to rolls all of the dice a given number of times.
-        The class keeps the results of its most recent play.
+        A die whose roll depends on the face it rolled just before, for sequences of dependent events
+        such as the words of a text.
+        On top of the faces and weights of a Die, whose weights give the distribution of the first face,
+        it has a square matrix of transition weights: row i holds the weights of the faces that can follow face i.
+            - roll returns one sequence of faces, each one following the one before it.
+            - roll_chains returns many independent sequences, advanced in lockstep one step at a time.
+            - In a Game, a MarkovDie placed after a die with the same faces rolls from the transition row
+            of the face that die rolled, so each roll of the game is a sequence across the dice;
+            otherwise it rolls from its weights like a Die.
+        Each row of transition weights is turned into cumulative weights once,
+        and only rebuilt after a transition weight has been changed.
     """
+    __slots__ = ('_transitions', '_transition_cdf')
 
-    _dice_list = []
-    _dice_rolls = None
+    def __init__(self, faces, transitions=None, sampler='auto'):
+        """
+        INPUT:
+            faces: numpy array of strings or numbers which represents a possible outcome of a dice
+            transitions: square array of transition weights with one row and one column per face,
+                defaults to 1.0 everywhere (every face equally likely whatever came before)
+            sampler: sampling backend used for the first face of a sequence, one of SAMPLERS
+        """
+        super().__init__(faces, sampler)
+        face_count = self._faces.shape[0]
+        self._transition_cdf = None
+        self._transitions = np.ones((face_count, face_count), dtype=np.float64)
+        if transitions is not None:
+            transitions = np.array(transitions, dtype=np.float64)
+            if transitions.shape == (face_count, face_count):
+                self._transitions = transitions
+            else:
+                print("Please pass a square matrix of transition weights with one row and one column per face")
 
-    def __init__(self, dice_list):
+    def change_transition(self, from_face, to_face, weight):
         """
-        Takes a single parameter, a list of already instantiated similar Die objects.
+        Changes the weight of rolling to_face right after from_face
 
         INPUT:
-            dice_list: list of dice objects that will be rolled
+            from_face: face rolled before
+            to_face: face whose weight after from_face should be changed
+            weight: desired weight
         """
-        self._dice_list = dice_list
+        from_index = self._face_index.get(from_face)
+        to_index = self._face_index.get(to_face)
+        if from_index is None or to_index is None:
+            print("Face value not in dictionary")
+            return
+        weight = self._numeric_weight(weight)
+        if weight is not None:
+            self._transitions[from_index, to_index] = weight
+            self._transition_cdf = None
 
-    def play(self, roll_count):
+    def _transition_cdfs(self):
         """
-            Takes a parameter to specify how many times the dice should be rolled.
-            Saves the result of the play to a private dataframe of shape N rolls by M dice.
-            The private dataframe should have the roll number is (as) a named index.
-            This results in a table of data with columns for roll number, the die number (its list index),
-            and the face rolled in that instance.
+        Returns the normalized cumulative transition weights, one row per face rolled before
 
-            INPUT:
-                rollCount: Number of rolls for all di(c)e
+        OUTPUT:
+            cdf: float64 numpy array of shape (faces, faces), each row increasing to 1.0
         """
-        self._dice_rolls = pd.DataFrame(columns=[str(i+1) for i in range(len(self._dice_list))])
-        self._dice_rolls['roll_number'] = [i+1 for i in range(roll_count)]
-        self._dice_rolls.set_index('roll_number',inplace=True)
-        self._dice_rolls.index.name = 'roll_number'
-        dice_number = 1
-        print(["IN METHOD DICE LIST"] + self._dice_list)
-        for dice in self._dice_list:
-            self._dice_rolls[str(dice_number)] = dice.roll(roll_count)
-            dice_number = dice_number + 1
+        if self._transition_cdf is None:
+            totals = self._transitions.sum(axis=1)
+            if (totals <= 0).any():
+                raise ValueError("Invalid transition weights: the weights following a face sum to zero")
+            cdf = np.cumsum(self._transitions, axis=1) / totals[:, None]
+            cdf[:, -1] = 1.0
+            self._transition_cdf = cdf
+        return self._transition_cdf
 
-    def show(self, wide=True):
+    def _next_indices(self, states, uniforms):
         """
-        A method to show the user the results of the most recent play.
-        This method just passes the private dataframe to the user.
-        Takes a parameter to return the dataframe in narrow or wide form.
-        This parameter defaults to wide form.
-        This parameter should raise an exception of the user passes an invalid option.
-        The narrow form of the dataframe will have a two column index with the roll number and the die number,
-        and a column for the face rolled.
-        The wide form of the dataframe will a single column index with the roll number, and each die number as a column.
-        INPUT
-            wide: True returns a dataframe which each row as a series of face values of all di(c)e rolled, False
-            returns a dataframe where each row is a value for an individual di(c)e
+        Advances many chains by one step at once: maps the uniform draw of each chain to the position of its next face,
+        through the cumulative transition weights of the face the chain is on
 
-        OUTPUT
-            dice_rolls:
+        INPUT:
+            states: int numpy array of the positions in _faces the chains are on
+            uniforms: float numpy array of uniform draws in [0, 1), one per chain
+        """
+        cdf = self._transition_cdfs()
+        face_count = cdf.shape[0]
+        if face_count < ALIAS_MIN_FACES:
+            indices = np.zeros(states.shape, dtype=np.int64)
+            for face in range(face_count - 1):
+                indices += uniforms >= cdf[states, face]
+            return indices
+        stacked = (cdf + np.arange(face_count)[:, None]).ravel()
+        # adding the offset can round a draw up to the next row, the clip keeps it on the last face
+        return np.minimum(np.searchsorted(stacked, uniforms + states, side='right') - states * face_count,
+                          face_count - 1)
+
+    def roll(self, roll_count=1, as_list=False, rng=None, bit_generator='PCG64'):
+        """
+        Rolls one sequence of roll_count faces: the first face is drawn from the weights,
+        each later face from the transition weights of the face before it.
+        The uniform draws are made at once and the sequence is then walked with a binary search per step.
+
+        INPUT:
+            see Die.roll
+
+        OUTPUT:
+            outcomes: numpy array (or list) of the sequence of faces rolled
+        """
+        uniforms = _uniforms(roll_count, make_rng(rng, bit_generator))
+        indices = []
+        if roll_count > 0:
+            cdf_rows = self._transition_cdfs().tolist()
+            state = int(self._inverse_cdf(uniforms[:1])[0])
+            indices.append(state)
+            for uniform in uniforms[1:].tolist():
+                state = bisect.bisect_right(cdf_rows[state], uniform)
+                indices.append(state)
+        outcomes = self._faces[np.array(indices, dtype=np.int64)]
+        if as_list:
+            return outcomes.tolist()
+        return outcomes
+
+    def roll_chains(self, chain_count, length, rng=None, bit_generator='PCG64'):
+        """
+        Rolls chain_count independent sequences of length faces, advancing all of them one step at a time
+
+        INPUT:
+            chain_count: number of sequences
+            length: number of faces of each sequence
+            rng: numpy Generator or seed to draw from (see make_rng), defaults to the global numpy random state
+            bit_generator: bit generator used when rng is a seed, e.g. 'PCG64', 'Philox' or 'SFC64'
+
+        OUTPUT:
+            outcomes: numpy array of faces of shape (chain_count, length), one sequence per row
+        """
+        rng = make_rng(rng, bit_generator)
+        indices = np.empty((chain_count, length), dtype=np.int64)
+        if length > 0:
+            indices[:, 0] = self._inverse_cdf(_uniforms(chain_count, rng))
+        for step in range(1, length):
+            indices[:, step] = self._next_indices(indices[:, step - 1], _uniforms(chain_count, rng))
+        return self._faces[indices]
+
+
+def _code_dtype(face_count):
+    """
+    Returns the smallest unsigned integer dtype that can hold a code for each of face_count faces
+    """
+    if face_count <= np.iinfo(np.uint8).max + 1:
+        return np.uint8
+    if face_count <= np.iinfo(np.uint16).max + 1:
+        return np.uint16
+    return np.uint32
+
+
+def _decode_wide(face_table, codes, roll_numbers):
+    """
+    Decodes a face code matrix into the wide results dataframe, with one column per die named by its number
+
+    INPUT:
+        face_table: numpy array of faces indexed by face code
+        codes: integer numpy array of shape (rolls, dice)
+        roll_numbers: int64 numpy array with the roll number of each row of codes
+
+    OUTPUT:
+        dice_rolls: dataframe with roll_number as a named index
+    """
+    return _pd().DataFrame({str(dice_number + 1): face_table[codes[:, dice_number]] for dice_number in range(codes.shape[1])},
+                           index=_pd().Index(roll_numbers, name='roll_number'))
+
+
+def _jackpot_mask(codes):
+    """
+    Returns a boolean numpy array that is True for each row of the face code matrix where all of the faces are equal
+    """
+    return (codes == codes[:, :1]).all(axis=1)
+
+
+def _unique_rows(codes, face_count, counts=None):
+    """
+    Finds the distinct rows of a face code matrix and how many times each one occurs.
+    When face_count ** dice fits in 63 bits each row is packed into a single int64 key,
+    otherwise the rows are compared column by column.
+
+    INPUT:
+        codes: integer numpy array of shape (rolls, dice)
+        face_count: number of faces in the face table
+        counts: optional int64 numpy array with a weight for each row (defaults to 1 per row)
+
+    OUTPUT:
+        rows: numpy array of distinct rows, in lexicographic order of face codes
+        row_counts: int64 numpy array with the (weighted) count of each distinct row
+    """
+    dice_count = codes.shape[1]
+    if dice_count * np.log2(max(face_count, 2)) < 63:
+        keys = np.zeros(codes.shape[0], dtype=np.int64)
+        for dice_number in range(dice_count):
+            keys = keys * face_count + codes[:, dice_number]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        rows = np.empty((unique_keys.shape[0], dice_count), dtype=codes.dtype)
+        for dice_number in reversed(range(dice_count)):
+            unique_keys, rows[:, dice_number] = np.divmod(unique_keys, face_count)
+    else:
+        rows, inverse = np.unique(codes, axis=0, return_inverse=True)
+    row_counts = np.bincount(inverse.ravel(), weights=counts, minlength=rows.shape[0]).astype(np.int64)
+    return rows, row_counts
+
+
+def _combo_frame(face_table, rows, counts, column='count'):
+    """
+    Builds the combo dataframe from distinct face code rows and their counts.
+    The index has one level per die, named by the die number, and is sorted like a sort_index over those levels.
+
+    INPUT:
+        face_table: numpy array of faces indexed by face code
+        rows: integer numpy array of distinct face code rows, shape (combinations, dice)
+        counts: numpy array with the count (or another value, such as a probability) of each row
+        column: name of the column holding counts
+
+    OUTPUT:
+        combo_df: dataframe with a count column
+    """
+    dice_name_columns = [str(dice_number + 1) for dice_number in range(rows.shape[1])]
+    sort_order = [int(name) - 1 for name in sorted(dice_name_columns)]
+    order = np.lexsort([rows[:, dice_number] for dice_number in reversed(sort_order)])
+    index = _pd().MultiIndex.from_arrays([face_table[rows[order, dice_number]] for dice_number in range(rows.shape[1])],
+                                         names=dice_name_columns)
+    return _pd().DataFrame({column: counts[order]}, index=index)
+
+
+def _face_counts(codes, face_count):
+    """
+    Counts how many times each face code appears in each row of a face code matrix
+
+    OUTPUT:
+        counts: int64 numpy array of shape (rolls, face_count)
+    """
+    roll_count = codes.shape[0]
+    flat = (np.arange(roll_count, dtype=np.int64) * face_count)[:, None] + codes
+    return np.bincount(flat.ravel(), minlength=roll_count * face_count).reshape(roll_count, face_count)
+
+
+def _row_blocks(codes, block_rows=BLOCK_ROWS):
+    """
+    Yields consecutive blocks of at most block_rows rows of a face code matrix,
+    so that a memory-mapped matrix is only read into memory one block at a time
+    """
+    for first_roll in range(0, codes.shape[0], block_rows):
+        yield codes[first_roll:first_roll + block_rows]
+
+
+def _save_npy(path, array):
+    """
+    Saves array to the .npy file path through a temporary file that is then renamed over it,
+    so that a file can be overwritten while it is memory-mapped, e.g. by a game loaded from it
+    """
+    with open(path + '.tmp', 'wb') as npy_file:
+        np.save(npy_file, array)
+    os.replace(path + '.tmp', path)
+
+
+class Metrics:
+    """
+    Optional instrumentation of games and analyzers, passed to Game (and Analyzer) as metrics.
+        - Phase timers: total seconds and number of calls of each phase, e.g. 'game.sample' for drawing the rolls,
+        'game.decode_wide' and 'game.narrow' for building the show dataframes, 'analyzer.combo_df' for a statistic.
+        Phases may nest, in which case the outer phase includes the time of the inner one.
+        - Counters: 'rolls' (die rolls drawn), 'allocated_bytes' (arrays and dataframes built),
+        'analyzer.cache_hits' and 'analyzer.cache_misses'.
+        - An optional sink, called as sink(kind, name, value) for every finished phase (kind 'phase', value in seconds)
+        and every counter increment (kind 'counter'), to forward the metrics elsewhere.
+    Games and analyzers without metrics skip all of this.
+    """
+
+    def __init__(self, sink=None):
+        """
+        INPUT:
+            sink: optional function called as sink(kind, name, value) for every phase and counter event
+        """
+        self.sink = sink
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
         """
+        Times the code run inside the with block as one call of the phase name
+        """
+        start = time.perf_counter()
         try:
-            if wide:
-                return self._dice_rolls
-            else:
-                self._dice_rolls.reset_index(inplace=True)
-                melted_frame = pd.melt(self._dice_rolls, id_vars='roll_number', var_name='dice_number_or_id', value_name='face_value', ignore_index=True)
-                #melted_frame. reset_index(inplace=True))
-                melted_frame['roll_number'] = melted_frame['roll_number'].astype(int)
-                melted_frame.set_index(['roll_number', 'dice_number_or_id'], inplace=True)
-                melted_frame.sort_values(['roll_number', 'dice_number_or_id', 'face_value'], ascending=True, inplace=True)
-                self._dice_rolls.set_index('roll_number', inplace=True)
-                return melted_frame
-        except TypeError:
-            print("Please pass a boolean (True or False) or a 1 or 0 for the wide argument")
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.sink is not None:
+                self.sink('phase', name, elapsed)
+
+    def count(self, name, amount=1):
+        """
+        Adds amount to the counter name
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+        if self.sink is not None:
+            self.sink('counter', name, amount)
 
+    def report(self):
+        """
+        Returns a dataframe indexed by phase or counter name, with the kind, the number of calls (phases only)
+        and the total seconds (phases) or count (counters)
+        """
+        rows = [{'name': name, 'kind': 'phase', 'calls': self.calls[name], 'value': seconds}
+                for name, seconds in self.seconds.items()]
+        rows = rows + [{'name': name, 'kind': 'counter', 'calls': None, 'value': value}
+                       for name, value in self.counters.items()]
+        return _pd().DataFrame(rows, columns=['name', 'kind', 'calls', 'value']).set_index('name')
 
-class Analyzer:
+    def reset(self):
+        """
+        Clears all of the timers and counters
+        """
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+
+
+_NO_PHASE = contextlib.nullcontext()
+
+
+def _phase(metrics, name):
     """
-    An analyzer takes the results of a single game and computes various
-    descriptive statistical properties about it. These properties results are
-    available as attributes of an Analyzer object. Attributes (and associated methods) include:
-        -A face counts per roll, i.e. the number of times a given face
-        appeared in each roll. For example, if a roll of five dice has all
-        sixes, then the counts for this roll would be 6 for the face value '6' and 0 for the other faces.
-        - A jackpot count, i.e. how many times a roll resulted in all faces being the same,
-        e.g. all one for a six-sided die.
-        - A combo count, i.e. how many combination types of faces were rolled and their counts.
+    Returns the timer of phase name when metrics are enabled, otherwise a context manager that does nothing
+    """
+    return _NO_PHASE if metrics is None else metrics.phase(name)
 
+
+class Game:
+    """
+        A game consists of rolling of one or more dice one or more times.
+        Each game is initialized with one or more dice (Die objects).
+        Each die object may have its own weights, and the dice may even have different faces:
+        all of them are placed on a shared table of faces, where a face a die does not have gets a zero weight.
+        The class has a behavior to play a game, i.e. to rolls all of the dice a given number of times.
+        When the shared table has fewer than ALIAS_MIN_FACES faces, all of the dice are rolled at once
+        from a stacked (dice, faces) matrix of cumulative weights, so the cost of a play grows with
+        the number of dice rolled and not with Python work per die.
+        The class keeps the results of its most recent play.
     """
-    _game = None
-    jackpot_df = None
-    combo_df = None
-    face_counts_per_roll_df = None
-    _faces = None
-    die_face_type = None
 
-    def __init__(self, game):
+    _dice_list = []
+    _codes = None
+    _face_table = None
+    _face_maps = None
+    _wide = None
+    _narrow = None
+    _version = 0
+    metrics = None
+
+    def __init__(self, dice_list, metrics=None):
         """
-        Takes a game object as its input parameter.
-        At initialization time, it also infers the data type of the di(c)e faces used.
+        Takes a list of already instantiated similar Die objects.
+        Builds the face lookup table shared by all of the dice: the sorted distinct faces of the dice,
+        so that a face code is the position of the face in the table.
 
         INPUT:
-        game: a completed game with one or more dice rolls with one or multiple di(c)e
+            dice_list: list of dice objects that will be rolled
+            metrics: optional Metrics collecting timers and counters of the game's plays and shows
         """
-        self._faces = game._dice_list[0]._faces
-        die_face_type = type(self._faces)
-        self._game = game
+        self._dice_list = dice_list
+        self.metrics = metrics
+        if len({dice._faces.dtype.kind in 'US' for dice in dice_list}) > 1:
+            print("Please pass dice whose faces are all numbers or all strings")
+            return
+        if len(dice_list) > 0:
+            self._face_table = np.unique(np.concatenate([dice._faces for dice in dice_list]))
+            self._face_maps = [np.searchsorted(self._face_table, dice._faces).astype(_code_dtype(self._face_table.shape[0]))
+                               for dice in dice_list]
 
-    def jackpot(self):
-        """"
-        A jackpot method to compute how many times the game resulted in all faces being identical.
-            -Returns an integer for the number times to the user.
-            -Stores the results as a dataframe of jackpot results in a public attribute.
-            -The dataframe should have the roll number as a named index.
+    def play(self, roll_count, rng=None, bit_generator='PCG64'):
         """
+            Takes a parameter to specify how many times the dice should be rolled.
+            Saves the result of the play to a private matrix of shape N rolls by M dice.
+            Each entry of the matrix is the code of the face rolled, i.e. its position in the shared face table,
+            stored as uint8 (or uint16/uint32 for dice with many faces).
+            The wide and narrow dataframes, with the roll number as a named index, are decoded from the matrix by show.
 
-        game_results_df = self._game.show(wide=False)
-        game_results_df.reset_index(inplace=True)
-        game_results_df_reduced = game_results_df[['roll_number', 'face_value']]
-        game_results_df_count_summary = game_results_df_reduced.groupby(game_results_df_reduced["roll_number"]).agg(face_value=('face_value','nunique')).reset_index()
-        game_results_df_wide = self._game.show(wide=True).reset_index()
-        self.jackpot_df = game_results_df_wide[game_results_df_wide['roll_number'].isin(game_results_df_count_summary[game_results_df_count_summary['face_value']==1]['roll_number']) ]
-        self.jackpot_df.set_index("roll_number", inplace=True)
-        self.jackpot_df.index.name = "roll_number"
-        return self.jackpot_df.shape[0]# game_results_df[['roll_number', 'face_value']].groupby("roll_number").agg({'face_value':'count'}).reset_index().shape[0]
+            INPUT:
+                rollCount: Number of rolls for all di(c)e
+                rng: numpy Generator or seed to draw from (see make_rng), defaults to the global numpy random state
+                bit_generator: bit generator used when rng is a seed, e.g. 'PCG64', 'Philox' or 'SFC64'
+        """
+        self._store(self._play_codes(roll_count, make_rng(rng, bit_generator)))
 
-    def combo(self):
+    def play_iter(self, roll_count, chunk_size=1000000, rng=None, bit_generator='PCG64'):
         """
-        A combo method to compute the distinct combinations of faces rolled, along with their counts.
-            - Combinations should be sorted and saved as a multi-columned index.
-            - Stores the results as a dataframe in a public attribute.
-        """
-        game_results_df = self._game.show(wide=True)
-        game_results_df.reset_index(inplace=True)
-        columns = [ col for col in game_results_df.columns.values.tolist() ] #if col not in ['face_value', 'roll_number']
-        game_results_df = game_results_df[columns]
-        dice_name_columns = [col for col in columns if col != "roll_number"]
-        game_results_combo_count = game_results_df.groupby(dice_name_columns).agg(count=('roll_number','count'))
-        game_results_combo_count.reset_index(inplace=True)
-        #game_results_combo_count.sort_values('count', ascending=False, inplace=True)
-        game_results_combo_count_sorted = game_results_combo_count.set_index(dice_name_columns)
-        self.combo_df = game_results_combo_count_sorted.sort_index(level=sorted(dice_name_columns))
+            Rolls all of the dice roll_count times, yielding the results in chunks of at most chunk_size rolls
+            instead of keeping them, so that peak memory is bounded by the chunk size.
+            Each chunk is a face code matrix like the one saved by play; chunks come in roll order,
+            so the first roll of a chunk follows the last roll of the previous one.
+            The results of the most recent play are left untouched.
+            The chunks can be passed to the JackpotAccumulator, ComboAccumulator and FaceCountsAccumulator.
 
-    def face_counts_per_roll(self):
+            INPUT:
+                roll_count: Number of rolls for all di(c)e
+                chunk_size: Maximum number of rolls in each chunk
+                rng: numpy Generator or seed to draw from (see make_rng), defaults to the global numpy random state
+                bit_generator: bit generator used when rng is a seed, e.g. 'PCG64', 'Philox' or 'SFC64'
+
+            OUTPUT:
+                chunks: generator of uint8/uint16 numpy arrays of shape (rolls in chunk, number of dice)
         """
-        A face counts per roll method to compute how many times a given face is rolled in each event.
-            - Stores the results as a dataframe in a public attribute.
-            - The dataframe has an index of the roll number and face values as columns (i.e. it is in wide format).
+        if chunk_size < 1:
+            print("Please pass a chunk size of at least 1")
+            return
+        rng = make_rng(rng, bit_generator)
+        for first_roll in range(0, roll_count, chunk_size):
+            yield self._play_codes(min(chunk_size, roll_count - first_roll), rng)
+
+    async def play_async(self, roll_count, chunk_size=1000000, rng=None, bit_generator='PCG64'):
+        """
+            The asyncio counterpart of play: the rolls are drawn one chunk at a time on the managed executor
+            (see get_executor), so the event loop keeps running while the game is played.
+            Cancelling the task stops the play between two chunks and leaves the results of the previous play untouched.
+            For a given rng the results are identical to those of play_iter.
+
+            INPUT:
+                roll_count: Number of rolls for all di(c)e
+                chunk_size: Maximum number of rolls drawn per call to the executor
+                rng: numpy Generator or seed to draw from (see make_rng), defaults to the global numpy random state
+                bit_generator: bit generator used when rng is a seed, e.g. 'PCG64', 'Philox' or 'SFC64'
+        """
+        rng = make_rng(rng, bit_generator)
+        chunks = [codes async for codes in self.play_aiter(roll_count, chunk_size, rng)]
+        self._store(np.concatenate(chunks) if chunks else self._play_codes(0, rng))
+
+    async def play_aiter(self, roll_count, chunk_size=1000000, rng=None, bit_generator='PCG64'):
+        """
+            The asyncio counterpart of play_iter: an async generator yielding the face code matrix of each chunk
+            as soon as it has been drawn on the managed executor, e.g. to stream partial results to a client
+            through the accumulators. The results of the most recent play are left untouched.
+
+            INPUT:
+                see play_iter
+
+            OUTPUT:
+                chunks: async generator of uint8/uint16 numpy arrays of shape (rolls in chunk, number of dice)
+        """
+        if chunk_size < 1:
+            print("Please pass a chunk size of at least 1")
+            return
+        import asyncio
+        rng = make_rng(rng, bit_generator)
+        loop = asyncio.get_running_loop()
+        for first_roll in range(0, roll_count, chunk_size):
+            yield await loop.run_in_executor(get_executor(), self._play_codes,
+                                             min(chunk_size, roll_count - first_roll), rng)
+
+    def play_parallel(self, roll_count, workers=None, seed=None, bit_generator='PCG64'):
+        """
+            Plays the game like play, but splits the rolls into one shard per worker process.
+            Each shard is rolled with its own random stream, spawned from a single seed with numpy's SeedSequence,
+            and the shards are joined in order into the private face code matrix.
+            For a given seed and number of workers the results are identical from one run to the next.
+
+            INPUT:
+                roll_count: Number of rolls for all di(c)e
+                workers: Number of worker processes, defaults to the number of CPUs
+                seed: int seed, SeedSequence or numpy Generator the shard streams are spawned from,
+                None draws fresh entropy
+                bit_generator: bit generator of the shard streams, e.g. 'PCG64', 'Philox' or 'SFC64'
+        """
+        _bit_generator(bit_generator)
+        workers = workers or os.cpu_count() or 1
+        shard_sizes = [roll_count // workers + (shard < roll_count % workers) for shard in range(workers)]
+        seeds = _spawn_seeds(seed, workers)
+        with _phase(self.metrics, 'game.sample_parallel'):
+            if workers == 1:
+                shards = [_play_shard(self._dice_list, shard_sizes[0], seeds[0], bit_generator)]
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    shards = list(pool.map(_play_shard, [self._dice_list] * workers, shard_sizes, seeds,
+                                           [bit_generator] * workers))
+        with _phase(self.metrics, 'game.merge'):
+            codes = np.concatenate(shards)
+        if self.metrics is not None:
+            self.metrics.count('rolls', codes.size)
+            self.metrics.count('allocated_bytes', codes.nbytes)
+        self._store(codes)
+
+    def play_until(self, rel_error=0.05, confidence=0.95, batch_size=100000, max_rolls=10 ** 8, min_batches=4,
+                   top_combos=3, variance_reduction=None, rng=None, bit_generator='PCG64'):
+        """
+            Plays the game in batches of batch_size rolls until the Analyzer statistics are known precisely enough:
+            the jackpot rate and the frequencies of the top_combos most frequent combinations.
+            After each batch the running estimates get a confidence interval from the spread of the batch estimates
+            (batch means), which stays valid when the rolls within a batch are not independent.
+            Playing stops once the half width of every interval is at most rel_error times its estimate,
+            or once max_rolls rolls have been played. All of the rolls are saved like the results of play.
+
+            INPUT:
+                rel_error: target half width of the confidence intervals, relative to the estimates
+                confidence: confidence level of the intervals
+                batch_size: Number of rolls per batch
+                max_rolls: Number of rolls after which playing stops even if the target is not reached
+                min_batches: Number of batches played before the target is checked
+                top_combos: Number of most frequent combinations whose frequencies are tracked, 0 tracks none
+                variance_reduction: None, 'antithetic' (rolls u and 1 - u in each batch)
+                    or 'stratified' (stratified uniforms over each die's cumulative weights)
+                rng: numpy Generator or seed to draw from (see make_rng), defaults to the global numpy random state
+                bit_generator: bit generator used when rng is a seed, e.g. 'PCG64', 'Philox' or 'SFC64'
+
+            OUTPUT:
+                estimates: dataframe indexed by statistic ('jackpot' and the tracked combinations)
+                with the estimate, the bounds of its confidence interval, its relative error and the rolls played
+        """
+        if variance_reduction not in VARIANCE_REDUCTIONS:
+            print("Please pass a variance reduction of None, 'antithetic' or 'stratified'")
+            return None
+        if batch_size < 1:
+            print("Please pass a batch size of at least 1")
+            return None
+        if max_rolls < 1:
+            print("Please pass a maximum number of rolls of at least 1")
+            return None
+        import statistics
+        rng = make_rng(rng, bit_generator)
+        z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+        face_count = self._face_table.shape[0]
+        combo_rows = np.empty((0, len(self._dice_list)), dtype=_code_dtype(face_count))
+        combo_counts = np.empty(0, dtype=np.int64)
+        batches, jackpot_rates, batch_combos, combo_samples = [], [], [], {}
+        rolls = 0
+        while rolls < max_rolls:
+            codes = self._play_codes(min(batch_size, max_rolls - rolls), rng, variance_reduction)
+            batches.append(codes)
+            rolls = rolls + codes.shape[0]
+            jackpot_rates.append(_jackpot_mask(codes).mean())
+            if top_combos > 0:
+                rows, counts = _unique_rows(codes, face_count)
+                combo_rows, combo_counts = _unique_rows(np.concatenate([combo_rows, rows]), face_count,
+                                                        np.concatenate([combo_counts, counts]))
+                batch_combos.append((rows, counts / codes.shape[0]))
+            tracked = combo_rows[np.argsort(-combo_counts, kind='stable')[:top_combos]]
+            estimates = self._estimates(jackpot_rates, tracked, batch_combos, combo_samples, z)
+            if len(batches) >= min_batches and (estimates['relative_error'] <= rel_error).all():
+                break
+        self._store(np.concatenate(batches))
+        estimates['rolls'] = rolls
+        return estimates
+
+    def _estimates(self, jackpot_rates, tracked, batch_combos, combo_samples, z):
+        """
+        Builds the estimates dataframe of play_until from the per batch jackpot rates
+        and the per batch frequencies of the tracked combinations.
+        combo_samples keeps the list of per batch frequencies of every combination tracked so far, keyed by its codes,
+        so a combination only looks up the batches played since it was last tracked.
+        """
+        names = ['jackpot']
+        samples = [np.asarray(jackpot_rates)]
+        for row in tracked:
+            names.append('combo ' + str(tuple(self._face_table[row].tolist())))
+            row_samples = combo_samples.setdefault(row.tobytes(), [])
+            for rows, frequencies in batch_combos[len(row_samples):]:
+                row_samples.append(frequencies[(rows == row).all(axis=1)].sum())
+            samples.append(np.array(row_samples))
+        samples = np.vstack(samples)
+        estimate = samples.mean(axis=1)
+        if samples.shape[1] > 1:
+            half_width = z * samples.std(axis=1, ddof=1) / np.sqrt(samples.shape[1])
+        else:
+            half_width = np.full(estimate.shape, np.inf)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative_error = np.where(estimate > 0, half_width / estimate, np.inf)
+        return _pd().DataFrame({'estimate': estimate, 'lower': estimate - half_width, 'upper': estimate + half_width,
+                                'relative_error': relative_error}, index=_pd().Index(names, name='statistic'))
+
+    def summary(self):
+        """
+            Summarizes the results of the most recent play into a GameSummary, reading them one block of rolls
+            at a time, so that summaries of games played on separate processes or machines can be merged.
+
+            OUTPUT:
+                summary: GameSummary of the play
+        """
+        summary = GameSummary(self)
+        if self._codes is None:
+            return summary
+        with _phase(self.metrics, 'game.summary'):
+            for block in _row_blocks(self._codes):
+                summary.update(block)
+        return summary
+
+    def _store(self, codes):
+        """
+        Saves the face code matrix of a new play, drops the dataframes decoded from the previous one
+        and bumps the version token that analyzers check their cached statistics against
+        """
+        self._codes = codes
+        self._wide = None
+        self._narrow = None
+        self._version = self._version + 1
+
+    def save(self, path):
+        """
+        Saves the dice and the results of the most recent play to the directory path, in numpy's .npy format:
+            - codes.npy: the face code matrix of shape (rolls, dice)
+            - face_table.npy: the faces indexed by face code
+            - dice_faces.npy: the face codes of each die's faces, in the die's own order, padded with -1
+            - dice_weights.npy: the weights of each die's faces, padded with 0
+            - dice_transitions.npy: the transition weights of each MarkovDie, padded with 0, only if there is one
+            - meta.json: the format version, the dice samplers, which dice are MarkovDie and the shape of the results
+
+        Each file is written under a temporary name and renamed, so a game loaded with mmap can be saved back
+        to the directory it was loaded from.
+
+        INPUT:
+            path: directory to save to, created if it does not exist
+        """
+        os.makedirs(path, exist_ok=True)
+        face_count = max(dice._faces.shape[0] for dice in self._dice_list)
+        dice_faces = np.full((len(self._dice_list), face_count), -1, dtype=np.int64)
+        dice_weights = np.zeros((len(self._dice_list), face_count), dtype=np.float64)
+        for dice_number, dice in enumerate(self._dice_list):
+            dice_faces[dice_number, :dice._faces.shape[0]] = self._face_maps[dice_number]
+            dice_weights[dice_number, :dice._faces.shape[0]] = dice._w
+        markov = [isinstance(dice, MarkovDie) for dice in self._dice_list]
+        if any(markov):
+            dice_transitions = np.zeros((len(self._dice_list), face_count, face_count), dtype=np.float64)
+            for dice_number, dice in enumerate(self._dice_list):
+                if markov[dice_number]:
+                    dice_transitions[dice_number, :dice._faces.shape[0], :dice._faces.shape[0]] = dice._transitions
+            _save_npy(os.path.join(path, 'dice_transitions.npy'), dice_transitions)
+        codes = self._codes if self._codes is not None else np.empty((0, len(self._dice_list)), dtype=np.uint8)
+        _save_npy(os.path.join(path, 'codes.npy'), codes)
+        _save_npy(os.path.join(path, 'face_table.npy'), self._face_table)
+        _save_npy(os.path.join(path, 'dice_faces.npy'), dice_faces)
+        _save_npy(os.path.join(path, 'dice_weights.npy'), dice_weights)
+        with open(os.path.join(path, 'meta.json.tmp'), 'w') as meta_file:
+            json.dump({'format_version': SAVE_FORMAT_VERSION, 'roll_count': int(codes.shape[0]),
+                       'dice_count': len(self._dice_list), 'played': self._codes is not None,
+                       'samplers': [dice._sampler for dice in self._dice_list], 'markov': markov}, meta_file)
+        os.replace(os.path.join(path, 'meta.json.tmp'), os.path.join(path, 'meta.json'))
+
+    @classmethod
+    def load(cls, path, mmap=True, metrics=None):
+        """
+        Loads a game saved with save, with its dice and the results of its most recent play.
+        With mmap the face code matrix is memory-mapped read-only instead of read into memory,
+        so an Analyzer can work on results larger than the available memory.
+        Games saved in a newer format than SAVE_FORMAT_VERSION are refused.
+
+        INPUT:
+            path: directory the game was saved to
+            mmap: True memory-maps the face code matrix
+            metrics: optional Metrics for the loaded game
+
+        OUTPUT:
+            game: Game object
+        """
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+        if meta['format_version'] > SAVE_FORMAT_VERSION:
+            raise ValueError("Game saved in format version " + str(meta['format_version']) +
+                             ", this version of montecarlo reads up to " + str(SAVE_FORMAT_VERSION))
+        face_table = np.load(os.path.join(path, 'face_table.npy'))
+        dice_faces = np.load(os.path.join(path, 'dice_faces.npy'))
+        dice_weights = np.load(os.path.join(path, 'dice_weights.npy'))
+        markov = meta.get('markov', [False] * len(meta['samplers']))
+        if any(markov):
+            dice_transitions = np.load(os.path.join(path, 'dice_transitions.npy'))
+        dice_list = []
+        for dice_number, sampler in enumerate(meta['samplers']):
+            face_codes = dice_faces[dice_number]
+            faces = face_table[face_codes[face_codes >= 0]]
+            if markov[dice_number]:
+                dice = MarkovDie(faces, dice_transitions[dice_number, :faces.shape[0], :faces.shape[0]], sampler=sampler)
+            else:
+                dice = Die(faces, sampler=sampler)
+            dice._w[:] = dice_weights[dice_number, :dice._faces.shape[0]]
+            dice_list.append(dice)
+        game = cls(dice_list, metrics=metrics)
+        if meta['played']:
+            game._store(np.load(os.path.join(path, 'codes.npy'), mmap_mode='r' if mmap else None))
+        return game
+
+    def _play_codes(self, roll_count, rng=None, variance_reduction=None):
+        """
+        Rolls each die roll_count times and returns the face code matrix of shape (roll_count, number of dice).
+        With a variance reduction scheme (see VARIANCE_REDUCTIONS) the dice are rolled through their cumulative weights.
+        """
+        with _phase(self.metrics, 'game.sample'):
+            if (self._face_table.shape[0] < ALIAS_MIN_FACES and not any(self._chain_links())
+                    and all(dice._sampler in ('auto', 'cdf') for dice in self._dice_list)):
+                codes = self._stacked_codes(roll_count, rng, variance_reduction)
+            else:
+                codes = self._dice_codes(roll_count, rng, variance_reduction)
+        if self.metrics is not None:
+            self.metrics.count('rolls', codes.size)
+            self.metrics.count('allocated_bytes', codes.nbytes)
+        return codes
+
+    def _stacked_codes(self, roll_count, rng=None, variance_reduction=None):
+        """
+        Rolls the dice a group at a time, each group holding about BLOCK_ROWS draws. The cumulative weights of the dice
+        of a group, each in its own face order, are stacked into a (dice, faces) matrix padded with 1.0, and the
+        position of each roll among its die's faces is the number of cumulative weights at or below its uniform draw,
+        counted for every die and roll of the group in one pass per face, then mapped to a code through _face_maps.
+        The uniforms are drawn die by die and compared with the dice's own cumulative weights like in _dice_codes,
+        so both give the same rolls for the same rng.
+        """
+        dice_count = len(self._dice_list)
+        width = max(dice._faces.shape[0] for dice in self._dice_list)
+        cdfs = np.ones((dice_count, width), dtype=np.float64)
+        face_maps = np.zeros((dice_count, width), dtype=_code_dtype(self._face_table.shape[0]))
+        for dice_number, dice in enumerate(self._dice_list):
+            cdfs[dice_number, :dice._faces.shape[0]] = dice._cumulative_weights()
+            face_maps[dice_number, :dice._faces.shape[0]] = self._face_maps[dice_number]
+        codes = np.empty((roll_count, dice_count), dtype=face_maps.dtype)
+        group_size = max(1, BLOCK_ROWS // max(roll_count, 1))
+        for first in range(0, dice_count, group_size):
+            group = slice(first, min(first + group_size, dice_count))
+            if variance_reduction is None:
+                uniforms = _uniforms((group.stop - first, roll_count), rng)
+            else:
+                uniforms = np.stack([_reduced_uniforms(roll_count, rng, variance_reduction)
+                                     for dice in self._dice_list[group]])
+            positions = np.zeros(uniforms.shape, dtype=_code_dtype(width))
+            for face in range(width - 1):
+                positions += uniforms >= cdfs[group, face, None]
+            codes[:, group] = np.take_along_axis(face_maps[group], positions, axis=1).T
+        return codes
+
+    def _dice_codes(self, roll_count, rng=None, variance_reduction=None):
+        """
+        Rolls the dice one at a time with their own sampling backend, for dice with many faces
+        where an alias table or a search of the cumulative weights beats comparing a draw with every face.
+        A MarkovDie chained to the die before it (see _chain_links) advances the roll_count chains
+        from the faces that die rolled.
+        """
+        codes = np.empty((roll_count, len(self._dice_list)), dtype=_code_dtype(self._face_table.shape[0]))
+        indices = None
+        for dice_number, (dice, chained) in enumerate(zip(self._dice_list, self._chain_links())):
+            if chained:
+                uniforms = _uniforms(roll_count, rng) if variance_reduction is None else \
+                    _reduced_uniforms(roll_count, rng, variance_reduction)
+                indices = dice._next_indices(indices, uniforms)
+            elif variance_reduction is None:
+                indices = dice._roll_indices(roll_count, rng)
+            else:
+                indices = dice._inverse_cdf(_reduced_uniforms(roll_count, rng, variance_reduction))
+            codes[:, dice_number] = self._face_maps[dice_number][indices]
+        return codes
+
+    def _chain_links(self):
+        """
+        Returns, for each die, whether it is a MarkovDie rolling from the face rolled by the die before it,
+        which is the case when that die has the same faces
+        """
+        return [dice_number > 0 and isinstance(dice, MarkovDie)
+                and np.array_equal(self._dice_list[dice_number - 1]._faces, dice._faces)
+                for dice_number, dice in enumerate(self._dice_list)]
+
+    def _transition_probabilities(self):
+        """
+        Returns, for each die, None when it is rolled independently of the others, or the matrix of its probabilities
+        over the shared face table given the face rolled by the die before it, when it is chained to that die
+
+        OUTPUT:
+            transitions: list with None or a float64 numpy array of shape (faces in the face table, faces in the face table)
+            per die, where row i is the distribution of the die's face after face code i
+        """
+        face_count = self._face_table.shape[0]
+        transitions = []
+        for dice_number, (dice, chained) in enumerate(zip(self._dice_list, self._chain_links())):
+            if not chained:
+                transitions.append(None)
+                continue
+            cdf = dice._transition_cdfs()
+            matrix = np.zeros((face_count, face_count), dtype=np.float64)
+            face_map = self._face_maps[dice_number]
+            matrix[np.ix_(face_map, face_map)] = np.diff(cdf, axis=1, prepend=0.0)
+            transitions.append(matrix)
+        return transitions
+
+    def _probabilities(self):
+        """
+        Returns the normalized face weights of every die over the shared face table
+
+        OUTPUT:
+            probabilities: float64 numpy array of shape (dice, faces in the face table), each row sums to 1;
+            a face a die does not have gets probability 0
+        """
+        probabilities = np.zeros((len(self._dice_list), self._face_table.shape[0]), dtype=np.float64)
+        for dice_number, dice in enumerate(self._dice_list):
+            total = dice._w.sum()
+            if total <= 0:
+                raise ValueError("Invalid weights: weights sum to zero")
+            probabilities[dice_number, self._face_maps[dice_number]] = dice._w / total
+        return probabilities
+
+    def _face_order(self):
+        """
+        Returns the face codes in the order faces are shown as columns: the faces of the first die in its own order,
+        followed by any other face of the game in table order
+        """
+        first = self._face_maps[0].astype(np.int64)
+        return np.concatenate([first, np.setdiff1d(np.arange(self._face_table.shape[0]), first)])
+
+    @property
+    def _dice_rolls(self):
+        """
+        The wide dataframe of the most recent play, decoded from the face code matrix the first time it is asked for.
+        None before the first play.
+        """
+        if self._wide is None and self._codes is not None:
+            with _phase(self.metrics, 'game.decode_wide'):
+                self._wide = _decode_wide(self._face_table, self._codes,
+                                          np.arange(1, self._codes.shape[0] + 1, dtype=np.int64))
+            if self.metrics is not None:
+                self.metrics.count('allocated_bytes', int(self._wide.memory_usage().sum()))
+        return self._wide
+
+    def show(self, wide=True):
+        """
+        A method to show the user the results of the most recent play.
+        This method just passes the private dataframe to the user.
+        Takes a parameter to return the dataframe in narrow or wide form.
+        This parameter defaults to wide form.
+        This parameter should raise an exception of the user passes an invalid option.
+        The narrow form of the dataframe will have a two column index with the roll number and the die number,
+        and a column for the face rolled. It is built straight from the face code matrix, whose rows are already
+        in roll order: the die number and the face are categorical, so the face column shares the matrix's codes
+        and the dataframe takes about the room of its index and one small integer per face rolled.
+        The wide form of the dataframe will a single column index with the roll number, and each die number as a column.
+        Both forms are kept until the next play, so asking for them again is free; neither changes the other.
+        INPUT
+            wide: True returns a dataframe which each row as a series of face values of all di(c)e rolled, False
+            returns a dataframe where each row is a value for an individual di(c)e
+
+        OUTPUT
+            dice_rolls:
+        """
+        try:
+            if wide:
+                return self._dice_rolls
+            elif self._narrow is None and self._codes is not None:
+                with _phase(self.metrics, 'game.narrow'):
+                    self._narrow = self._narrow_frame()
+                if self.metrics is not None:
+                    self.metrics.count('allocated_bytes', int(self._narrow.memory_usage(index=True, deep=False).sum()))
+            return self._narrow
+        except TypeError:
+            print("Please pass a boolean (True or False) or a 1 or 0 for the wide argument")
+
+    def _narrow_frame(self):
+        """
+        Builds the narrow dataframe from the face code matrix, roll by roll and die by die
+        """
+        pd = _pd()
+        roll_count, dice_count = self._codes.shape
+        dice_numbers = pd.CategoricalIndex([str(dice_number + 1) for dice_number in range(dice_count)],
+                                           name='dice_number_or_id')
+        # index codes in the smallest signed dtype that pandas would cast them to anyway, to avoid a copy
+        roll_codes = np.repeat(np.arange(roll_count, dtype=np.int32 if roll_count < 2 ** 31 else np.int64), dice_count)
+        dice_codes = np.tile(np.arange(dice_count, dtype=np.int8 if dice_count < 2 ** 7 else np.int16 if dice_count < 2 ** 15 else np.int32), roll_count)
+        index = pd.MultiIndex(levels=[pd.Index(np.arange(1, roll_count + 1, dtype=np.int64)), dice_numbers], codes=[roll_codes, dice_codes],
+                              names=['roll_number', 'dice_number_or_id'], verify_integrity=False)
+        faces = pd.Categorical.from_codes(np.asarray(self._codes).reshape(-1), categories=self._face_table)
+        return pd.DataFrame({'face_value': faces}, index=index)
+
+
+def _play_shard(dice_list, roll_count, seed_sequence, bit_generator):
+    """
+    Rolls one shard of a parallel play in a worker process and returns its face code matrix
+
+    INPUT:
+        dice_list: list of the game's dice
+        roll_count: number of rolls in the shard
+        seed_sequence: numpy SeedSequence of the shard's random stream
+        bit_generator: name of the bit generator of the shard's random stream
+    """
+    return Game(dice_list)._play_codes(roll_count, make_rng(seed_sequence, bit_generator))
+
+
+def sweep(faces, weights, dice_count, roll_count, seed=None, workers=1, bit_generator='PCG64'):
+    """
+    Plays one game per weight configuration, all in batched calls, instead of building a Die, Game and Analyzer
+    for every point of a sensitivity analysis. Every game rolls dice_count dice with the same faces and weights.
+    The cumulative weights of all configurations are stacked into one sorted table by offsetting
+    configuration i by i, so the dice of every configuration are rolled with a single searchsorted.
+    Each configuration has its own random stream spawned from seed, so its results do not depend on
+    the number of workers or on the other configurations of the sweep.
+
+    INPUT:
+        faces: numerical or string numpy array of the faces shared by all configurations,
+        the statistics only depend on how many there are
+        weights: array of shape (configurations, number of faces), one non-negative weight vector per configuration
+        dice_count: number of dice of each game, at least 1
+        roll_count: number of rolls of each game
+        seed: int seed, SeedSequence or numpy Generator the configuration streams are spawned from,
+        None draws fresh entropy
+        workers: Number of worker processes the configurations are split across
+        bit_generator: bit generator of the configuration streams, e.g. 'PCG64', 'Philox' or 'SFC64'
+
+    OUTPUT:
+        results: dataframe indexed by configuration with the roll count, the jackpots rolled,
+        the jackpot rate and the exact jackpot probability of each configuration
+    """
+    faces = np.asarray(faces)
+    if faces.dtype.kind not in ('f', 'i', 'u', 'S', 'U'):
+        print("Please pass a numerical or string dtype numpy array")
+        return None
+    weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+    if weights.shape[1] != faces.shape[0]:
+        print("Please pass one weight per face in each weight configuration")
+        return None
+    if not (np.isfinite(weights) & (weights >= 0)).all():
+        print("Weight negative or not finite, please enter a non-negative weight")
+        return None
+    if dice_count < 1:
+        print("Please pass a dice count of at least 1")
+        return None
+    _bit_generator(bit_generator)
+    totals = weights.sum(axis=1)
+    if (totals <= 0).any():
+        raise ValueError("Invalid weights: weights sum to zero")
+    probabilities = weights / totals[:, None]
+    cdfs = np.cumsum(probabilities, axis=1)
+    cdfs[:, -1] = 1.0
+    config_count = weights.shape[0]
+    seeds = _spawn_seeds(seed, config_count)
+    shards = np.array_split(np.arange(config_count), min(workers, config_count))
+    if len(shards) == 1:
+        jackpots = [_sweep_shard(cdfs, seeds, dice_count, roll_count, bit_generator)]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            jackpots = list(pool.map(_sweep_shard, [cdfs[shard] for shard in shards],
+                                     [[seeds[i] for i in shard] for shard in shards],
+                                     [dice_count] * len(shards), [roll_count] * len(shards),
+                                     [bit_generator] * len(shards)))
+    jackpots = np.concatenate(jackpots)
+    return _pd().DataFrame({'roll_count': roll_count, 'jackpots': jackpots, 'jackpot_rate': jackpots / roll_count,
+                            'exact_jackpot': (probabilities ** dice_count).sum(axis=1)},
+                           index=_pd().RangeIndex(config_count, name='config'))
+
+
+def _sweep_shard(cdfs, seeds, dice_count, roll_count, bit_generator):
+    """
+    Rolls the games of one shard of a sweep and returns the number of jackpots of each configuration.
+    The rolls are drawn a chunk at a time, so that the uniforms of all configurations hold about BLOCK_ROWS values;
+    each configuration draws its uniforms roll by roll, so the chunk size does not change which draw each die gets.
+    Dice with fewer than ALIAS_MIN_FACES faces are rolled by counting the cumulative weights below each draw,
+    dice with more faces with a single searchsorted over the stacked cumulative weights of the configurations.
+
+    INPUT:
+        cdfs: normalized cumulative weights of the shard's configurations, one row per configuration
+        seeds: numpy SeedSequence of each configuration's random stream
+        dice_count, roll_count, bit_generator: see sweep
+    """
+    config_count, face_count = cdfs.shape
+    rngs = [make_rng(seed_sequence, bit_generator) for seed_sequence in seeds]
+    offsets = np.arange(config_count)[:, None, None]
+    stacked = (cdfs + np.arange(config_count)[:, None]).ravel()
+    jackpots = np.zeros(config_count, dtype=np.int64)
+    chunk_size = max(1, BLOCK_ROWS // (config_count * dice_count))
+    for first_roll in range(0, roll_count, chunk_size):
+        rolls = min(chunk_size, roll_count - first_roll)
+        uniforms = np.stack([rng.random((rolls, dice_count)).T for rng in rngs])
+        if face_count < ALIAS_MIN_FACES:
+            codes = np.zeros(uniforms.shape, dtype=_code_dtype(face_count))
+            for face in range(face_count - 1):
+                codes += uniforms >= cdfs[:, face, None, None]
+        else:
+            # adding the offset can round a draw up to the next configuration, the clip keeps it on the last face
+            codes = np.minimum(np.searchsorted(stacked, uniforms + offsets, side='right') - offsets * face_count,
+                               face_count - 1)
+        jackpot = np.ones((config_count, rolls), dtype=bool)
+        for dice_number in range(1, dice_count):
+            jackpot &= codes[:, dice_number] == codes[:, 0]
+        jackpots += jackpot.sum(axis=1)
+    return jackpots
+
+
+class Analyzer:
+    """
+    An analyzer takes the results of a single game and computes various
+    descriptive statistical properties about it. These properties results are
+    available as attributes of an Analyzer object. Attributes (and associated methods) include:
+        -A face counts per roll, i.e. the number of times a given face
+        appeared in each roll. For example, if a roll of five dice has all
+        sixes, then the counts for this roll would be 6 for the face value '6' and 0 for the other faces.
+        - A jackpot count, i.e. how many times a roll resulted in all faces being the same,
+        e.g. all one for a six-sided die.
+        - A combo count, i.e. how many combination types of faces were rolled and their counts.
+    The exact_ methods compute the same statistics as probabilities straight from the dice weights,
+    without needing the game to be played.
+    Each statistic is computed once per play of the game: asking for it again returns the stored result
+    until the game is played again.
+    """
+    _game = None
+    jackpot_df = None
+    combo_df = None
+    face_counts_per_roll_df = None
+    _faces = None
+    die_face_type = None
+    _cache = None
+    metrics = None
+    exact_jackpot_df = None
+    exact_combo_df = None
+    exact_face_counts_df = None
+    combo_sketch_df = None
+    distinct_combos = None
+
+    def __init__(self, game, metrics=None):
+        """
+        Takes a game object as its input parameter.
+        At initialization time, it also infers the data type of the di(c)e faces used.
+
+        INPUT:
+        game: a completed game with one or more dice rolls with one or multiple di(c)e
+        metrics: optional Metrics collecting the analyzer's timers and counters, defaults to the game's metrics
+        """
+        self._faces = game._dice_list[0]._faces
+        die_face_type = type(self._faces)
+        self._game = game
+        self._cache = {}
+        self.metrics = game.metrics if metrics is None else metrics
+
+    def _cached(self, name, compute):
+        """
+        Returns the statistic or intermediate result stored under name, computing it with compute
+        if it was not computed yet for the most recent play of the game.
+        Results are checked against the version token that Game bumps on every play.
+
+        INPUT:
+            name: key of the result in the cache
+            compute: function without arguments returning the result
+        """
+        version, result = self._cache.get(name, (None, None))
+        if version != self._game._version:
+            with _phase(self.metrics, 'analyzer.' + name):
+                result = compute()
+            self._cache[name] = (self._game._version, result)
+            if self.metrics is not None:
+                self.metrics.count('analyzer.cache_misses')
+        elif self.metrics is not None:
+            self.metrics.count('analyzer.cache_hits')
+        return result
+
+    def jackpot(self):
+        """"
+        A jackpot method to compute how many times the game resulted in all faces being identical.
+            -Returns an integer for the number times to the user.
+            -Stores the results as a dataframe of jackpot results in a public attribute.
+            -The dataframe should have the roll number as a named index.
+            -Jackpots are found with a row-wise "all equal" test on the game's face code matrix,
+            and only the jackpot rolls are decoded; the game itself is left untouched.
+        """
+        self.jackpot_df = self._cached('jackpot_df', self._jackpot_frame)
+        return self.jackpot_df.shape[0]
+
+    def _jackpot_frame(self):
+        """
+        Builds the jackpot dataframe. When the per roll face counts are already cached,
+        a jackpot is a roll where one face was counted once per die; otherwise the face codes of each roll are compared.
+        """
+        codes = self._game._codes
+        version, face_counts = self._cache.get('face_counts', (None, None))
+        if version == self._game._version:
+            jackpot_rolls = np.flatnonzero(face_counts.max(axis=1) == codes.shape[1])
+            return _decode_wide(self._game._face_table, codes[jackpot_rolls], jackpot_rolls + 1)
+        accumulator = JackpotAccumulator(self._game)
+        for block in _row_blocks(codes):
+            accumulator.update(block)
+        accumulator.result()
+        return accumulator.jackpot_df
+
+    async def jackpot_async(self):
+        """
+        The asyncio counterpart of jackpot: the game is scanned one block of rolls at a time on the managed executor
+        (see get_executor), so the task can be cancelled between two blocks. Shares its cached result with jackpot.
+        """
+        accumulator = JackpotAccumulator(self._game)
+
+        def finish():
+            accumulator.result()
+            return accumulator.jackpot_df
+
+        self.jackpot_df = await self._accumulate_async('jackpot_df', accumulator, finish)
+        return self.jackpot_df.shape[0]
+
+    async def combo_async(self):
+        """
+        The asyncio counterpart of combo, scanning the game one block of rolls at a time like jackpot_async
+        """
+        accumulator = ComboAccumulator(self._game)
+        self.combo_df = await self._accumulate_async('combo_df', accumulator, accumulator.result)
+        return self.combo_df
+
+    async def face_counts_per_roll_async(self):
+        """
+        The asyncio counterpart of face_counts_per_roll, run as a single call on the managed executor
+        """
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), self.face_counts_per_roll)
+
+    async def _accumulate_async(self, name, accumulator, finish):
+        """
+        Feeds the game's rolls to accumulator one block at a time on the managed executor
+        and caches the result of finish under name, unless it is already cached for the most recent play
+
+        INPUT:
+            name: key of the result in the cache
+            accumulator: JackpotAccumulator or ComboAccumulator of the game
+            finish: function without arguments returning the result once every block has been consumed
+        """
+        version, result = self._cache.get(name, (None, None))
+        if version == self._game._version:
+            if self.metrics is not None:
+                self.metrics.count('analyzer.cache_hits')
+            return result
+        import asyncio
+        version, codes = self._game._version, self._game._codes
+        loop = asyncio.get_running_loop()
+        with _phase(self.metrics, 'analyzer.' + name):
+            for block in _row_blocks(codes):
+                await loop.run_in_executor(get_executor(), accumulator.update, block)
+            result = await loop.run_in_executor(get_executor(), finish)
+        self._cache[name] = (version, result)
+        if self.metrics is not None:
+            self.metrics.count('analyzer.cache_misses')
+        return result
+
+    def combo(self):
+        """
+        A combo method to compute the distinct combinations of faces rolled, along with their counts.
+            - Combinations should be sorted and saved as a multi-columned index.
+            - Stores the results as a dataframe in a public attribute, and returns it.
+            - Each row of the game's face code matrix is hashed into a single key and the keys are counted,
+            so no groupby over face columns is needed. The matrix is read one block of rolls at a time,
+            so the combinations of a memory-mapped game (see Game.load) can be counted without loading it.
+        """
+        self.combo_df = self._cached('combo_df', self._combo_frame)
+        return self.combo_df
+
+    def combo_sketch(self, top_k=10, capacity=1000):
+        """
+        An approximate combo method for games with too many distinct combinations for combo:
+        the game is streamed through a ComboSketch, so memory does not grow with the number of combinations.
+            - Returns the top_k most frequent combinations in the combo_df layout, with a count column
+            (an upper bound of each count) and a count_lower column (a lower bound).
+            - Stores the results as a dataframe in a public attribute, and the estimated number of distinct
+            combinations in another one.
+            - Unlike the exact statistics, it is computed again on every call.
+
+        INPUT:
+            top_k: number of combinations returned
+            capacity: number of combinations tracked by the sketch, at least top_k
+        """
+        sketch = ComboSketch(self._game, capacity=max(capacity, top_k))
+        with _phase(self.metrics, 'analyzer.combo_sketch_df'):
+            for block in _row_blocks(self._game._codes):
+                sketch.update(block)
+            self.combo_sketch_df = sketch.result(top_k)
+        self.distinct_combos = sketch.distinct_combos
+        return self.combo_sketch_df
+
+    def _combo_frame(self):
+        """
+        Builds the combo dataframe, counting the combinations of the game one block of rolls at a time
+        """
+        accumulator = ComboAccumulator(self._game)
+        for block in _row_blocks(self._game._codes):
+            accumulator.update(block)
+        return accumulator.result()
+
+    def face_counts_per_roll(self):
+        """
+        A face counts per roll method to compute how many times a given face is rolled in each event.
+            - Stores the results as a dataframe in a public attribute, and returns it.
+            - The dataframe has an index of the roll number and face values as columns (i.e. it is in wide format).
+            - The counts are integers, computed in a single pass over the game's face code matrix.
+        """
+        self.face_counts_per_roll_df = self._cached('face_counts_per_roll_df', self._face_counts_frame)
+        return self.face_counts_per_roll_df
+
+    def _face_count_matrix(self):
+        """
+        Counts the faces of each roll of the game, one block of rolls at a time
+
+        OUTPUT:
+            face_counts: int64 numpy array of shape (rolls, faces in the face table)
+        """
+        codes = self._game._codes
+        face_counts = np.empty((codes.shape[0], self._game._face_table.shape[0]), dtype=np.int64)
+        for first_roll in range(0, codes.shape[0], BLOCK_ROWS):
+            block = codes[first_roll:first_roll + BLOCK_ROWS]
+            face_counts[first_roll:first_roll + block.shape[0]] = _face_counts(block, self._game._face_table.shape[0])
+        return face_counts
+
+    def _face_counts_frame(self):
+        """
+        Builds the face counts per roll dataframe from the cached per roll face counts
+        """
+        face_counts = self._cached('face_counts', self._face_count_matrix)
+        order = self._game._face_order()
+        roll_numbers = _pd().RangeIndex(1, face_counts.shape[0] + 1, name='roll_number')
+        return _pd().DataFrame(face_counts[:, order], columns=self._game._face_table[order], index=roll_numbers)
+
+    def exact_jackpot(self):
+        """
+        Computes the exact probability that a roll of the game is a jackpot from the dice weights, without rolling:
+        the sum over faces of the product of each die's probability of that face
+        (given the same face before it, for a chained MarkovDie).
+            - Returns the jackpot probability.
+            - Stores the probability of each possible jackpot in the exact_jackpot_df attribute, a dataframe indexed
+            like combo_df (one level per die) with a probability column.
+        """
+        probabilities = self._game._probabilities()
+        transitions = self._game._transition_probabilities()
+        jackpot_probabilities = probabilities[0].copy()
+        for dice_probabilities, transition in zip(probabilities[1:], transitions[1:]):
+            jackpot_probabilities *= dice_probabilities if transition is None else np.diag(transition)
+        faces = np.flatnonzero(jackpot_probabilities > 0)
+        rows = np.repeat(faces[:, None], probabilities.shape[0], axis=1)
+        self.exact_jackpot_df = _combo_frame(self._game._face_table, rows, jackpot_probabilities[faces], 'probability')
+        return float(jackpot_probabilities.sum())
+
+    def exact_combo(self, max_combinations=10 ** 7):
+        """
+        Computes the exact probability of every combination of faces by enumerating the product of the dice's faces.
+            - Stores the results in the exact_combo_df attribute, a dataframe laid out like combo_df
+            with a probability column instead of a count, and returns it.
+            - Faces a die cannot roll are left out, and the enumeration is refused (printing a message)
+            beyond max_combinations combinations.
+            - A chained MarkovDie multiplies in the probability of its face given the face before it,
+            and combinations it cannot follow are left out.
+
+        INPUT:
+            max_combinations: largest number of combinations to enumerate
+        """
+        probabilities = self._game._probabilities()
+        transitions = self._game._transition_probabilities()
+        supports = [np.flatnonzero(dice_probabilities > 0 if transition is None else transition.sum(axis=0) > 0)
+                    for dice_probabilities, transition in zip(probabilities, transitions)]
+        if np.prod([float(support.shape[0]) for support in supports]) > max_combinations:
+            print("Too many combinations to enumerate, please simulate the game instead")
+            return None
+        grids = np.meshgrid(*supports, indexing='ij')
+        rows = np.stack([grid.ravel() for grid in grids], axis=1)
+        combination_probabilities = probabilities[0, rows[:, 0]]
+        for dice_number in range(1, rows.shape[1]):
+            transition = transitions[dice_number]
+            if transition is None:
+                combination_probabilities = combination_probabilities * probabilities[dice_number, rows[:, dice_number]]
+            else:
+                combination_probabilities = combination_probabilities * transition[rows[:, dice_number - 1],
+                                                                                   rows[:, dice_number]]
+        possible = combination_probabilities > 0
+        self.exact_combo_df = _combo_frame(self._game._face_table, rows[possible], combination_probabilities[possible],
+                                           'probability')
+        return self.exact_combo_df
+
+    def exact_face_counts(self):
+        """
+        Computes the exact distribution of how many times each face shows up in a roll,
+        by multiplying out one polynomial (1 - p + p x) per die for each face.
+        With chained MarkovDie the dice are not independent, and the count is tracked jointly
+        with the face the last die rolled, one die at a time.
+            - Stores the distribution in the exact_face_counts_df attribute: a dataframe indexed by the count
+            (0 to the number of dice) with face values as columns, each cell the probability of that count.
+            - Returns a series with the expected count of each face per roll.
+        """
+        probabilities = self._game._probabilities()
+        transitions = self._game._transition_probabilities()
+        if any(transition is not None for transition in transitions):
+            distribution, expected = self._chained_face_counts(probabilities, transitions)
+        else:
+            distribution = np.zeros((probabilities.shape[1], probabilities.shape[0] + 1), dtype=np.float64)
+            distribution[:, 0] = 1.0
+            for dice_probabilities in probabilities:
+                shifted = distribution[:, :-1] * dice_probabilities[:, None]
+                distribution = distribution * (1.0 - dice_probabilities)[:, None]
+                distribution[:, 1:] += shifted
+            expected = probabilities.sum(axis=0)
+        order = self._game._face_order()
+        faces = self._game._face_table[order]
+        self.exact_face_counts_df = _pd().DataFrame(distribution[order].T, columns=faces,
+                                                    index=_pd().Index(np.arange(distribution.shape[1]), name='face_count'))
+        return _pd().Series(expected[order], index=faces, name='expected_count')
+
+    @staticmethod
+    def _chained_face_counts(probabilities, transitions):
+        """
+        Computes the distribution of the count of each face per roll for dice that are not independent.
+        joint[f, c, s] is the probability that face f was counted c times so far and that the last die rolled s.
+
+        OUTPUT:
+            distribution: float64 numpy array of shape (faces, dice + 1)
+            expected: float64 numpy array with the expected count of each face
+        """
+        face_count, dice_count = probabilities.shape[1], probabilities.shape[0]
+        faces = np.arange(face_count)
+        joint = np.zeros((face_count, dice_count + 1, face_count), dtype=np.float64)
+        joint[:, 0, :] = probabilities[0]
+        joint[faces, 0, faces] = 0.0
+        joint[faces, 1, faces] = probabilities[0]
+        marginal = probabilities[0]
+        expected = probabilities[0].copy()
+        for dice_probabilities, transition in zip(probabilities[1:], transitions[1:]):
+            if transition is None:
+                transition = np.broadcast_to(dice_probabilities, (face_count, face_count))
+            joint = joint @ transition
+            counted = joint[faces, :, faces]
+            joint[faces, :, faces] = 0.0
+            joint[faces, 1:, faces] = counted[:, :-1]
+            marginal = marginal @ transition
+            expected = expected + marginal
+        return joint.sum(axis=2), expected
+
+
+class JackpotAccumulator:
+    """
+    The incremental counterpart of Analyzer.jackpot for games played in chunks with Game.play_iter.
+    Each chunk is consumed with update, and only the jackpot rolls are kept,
+    so the results are exact while memory is bounded by the chunk size and the number of jackpots.
+    """
+    _game = None
+    roll_count = 0
+    jackpot_count = 0
+    jackpot_df = None
+
+    def __init__(self, game):
+        """
+        INPUT:
+            game: the game whose chunks will be consumed
+        """
+        self._game = game
+        self._roll_numbers = []
+        self._face_codes = []
+
+    def update(self, codes):
+        """
+        Consumes the next chunk of rolls and updates the jackpot count and dataframe.
+
+        INPUT:
+            codes: face code matrix yielded by Game.play_iter
+        """
+        rolls = np.flatnonzero(_jackpot_mask(codes))
+        self._roll_numbers.append(rolls + self.roll_count + 1)
+        self._face_codes.append(codes[rolls, 0])
+        self.roll_count = self.roll_count + codes.shape[0]
+        self.jackpot_count = self.jackpot_count + rolls.shape[0]
+        self.jackpot_df = None
+
+    def result(self):
+        """
+        Returns the number of jackpots so far, and stores the jackpot rolls as a dataframe in the jackpot_df attribute,
+        with the same layout as Analyzer.jackpot_df.
+        """
+        face_codes = np.concatenate(self._face_codes) if self._face_codes else np.empty(0, dtype=np.uint8)
+        roll_numbers = np.concatenate(self._roll_numbers) if self._roll_numbers else np.empty(0, dtype=np.int64)
+        codes = np.repeat(face_codes[:, None], len(self._game._dice_list), axis=1)
+        self.jackpot_df = _decode_wide(self._game._face_table, codes, roll_numbers.astype(np.int64))
+        return self.jackpot_count
+
+
+class ComboAccumulator:
+    """
+    The incremental counterpart of Analyzer.combo for games played in chunks with Game.play_iter.
+    Only the distinct combinations seen so far and their counts are kept between chunks.
+    """
+    _game = None
+    roll_count = 0
+    combo_df = None
+
+    def __init__(self, game):
+        """
+        INPUT:
+            game: the game whose chunks will be consumed
+        """
+        self._game = game
+        self._rows = np.empty((0, len(game._dice_list)), dtype=_code_dtype(game._face_table.shape[0]))
+        self._counts = np.empty(0, dtype=np.int64)
+
+    def update(self, codes):
+        """
+        Consumes the next chunk of rolls and merges its combinations into the running counts.
+
+        INPUT:
+            codes: face code matrix yielded by Game.play_iter
+        """
+        face_count = self._game._face_table.shape[0]
+        rows, counts = _unique_rows(codes, face_count)
+        self._rows, self._counts = _unique_rows(np.concatenate([self._rows, rows]), face_count,
+                                                np.concatenate([self._counts, counts]))
+        self.roll_count = self.roll_count + codes.shape[0]
+        self.combo_df = None
+
+    def result(self):
+        """
+        Stores the combinations counted so far in the combo_df attribute, with the same layout as Analyzer.combo_df,
+        and returns it.
+        """
+        self.combo_df = _combo_frame(self._game._face_table, self._rows, self._counts)
+        return self.combo_df
+
+
+class FaceCountsAccumulator:
+    """
+    The incremental counterpart of Analyzer.face_counts_per_roll for games played in chunks with Game.play_iter.
+    A table of counts for every roll grows with the number of rolls, so the accumulator keeps, for each face,
+    a histogram of how many rolls showed that face 0, 1, ... M times (M dice), along with the face totals.
+    The counts of a single chunk are returned by update for callers that want to write them out as they go.
+    """
+    _game = None
+    roll_count = 0
+    face_counts_df = None
+
+    def __init__(self, game):
+        """
+        INPUT:
+            game: the game whose chunks will be consumed
+        """
+        self._game = game
+        self._histogram = np.zeros((game._face_table.shape[0], len(game._dice_list) + 1), dtype=np.int64)
+
+    def update(self, codes):
+        """
+        Consumes the next chunk of rolls and updates the face count histograms.
+
+        INPUT:
+            codes: face code matrix yielded by Game.play_iter
+
+        OUTPUT:
+            face_counts: int64 numpy array of shape (rolls in chunk, faces) with the count of each face code in each roll
+        """
+        face_count = self._game._face_table.shape[0]
+        face_counts = _face_counts(codes, face_count)
+        bins = self._histogram.shape[1]
+        flat = face_counts + (np.arange(face_count, dtype=np.int64) * bins)[None, :]
+        self._histogram += np.bincount(flat.ravel(), minlength=face_count * bins).reshape(face_count, bins)
+        self.roll_count = self.roll_count + codes.shape[0]
+        self.face_counts_df = None
+        return face_counts
+
+    def result(self):
+        """
+        Stores the face count histograms in the face_counts_df attribute and returns it.
+        The dataframe has the per roll count (0 to the number of dice) as a named index and face values as columns;
+        each cell is the number of rolls in which the face appeared that many times.
+        """
+        order = self._game._face_order()
+        self.face_counts_df = _pd().DataFrame(self._histogram[order].T, columns=self._game._face_table[order],
+                                              index=_pd().Index(np.arange(self._histogram.shape[1]), name='face_count'))
+        return self.face_counts_df
+
+    def face_totals(self):
+        """
+        Returns a series with the total number of times each face was rolled so far
+        """
+        order = self._game._face_order()
+        totals = self._histogram[order] @ np.arange(self._histogram.shape[1])
+        return _pd().Series(totals, index=self._game._face_table[order], name='count')
+
+
+def _row_hashes(codes):
+    """
+    Hashes each row of a face code matrix into a uint64, mixing the codes with FNV-1a
+    and finishing with the splitmix64 mixer so that every bit of the hash depends on every code
+    """
+    hashes = np.full(codes.shape[0], 0xcbf29ce484222325, dtype=np.uint64)
+    for dice_number in range(codes.shape[1]):
+        hashes = (hashes ^ codes[:, dice_number].astype(np.uint64)) * np.uint64(0x100000001b3)
+    hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+def _leading_zeros(values):
+    """
+    Counts the leading zero bits of each uint64 value, 64 for a zero
+    """
+    zeros = np.zeros(values.shape, dtype=np.int64)
+    values = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        high_clear = (values >> np.uint64(64 - shift)) == 0
+        zeros += high_clear * shift
+        values[high_clear] <<= np.uint64(shift)
+    return zeros + (values == 0)
+
+
+class ComboSketch:
+    """
+    An approximate counterpart of ComboAccumulator for games whose distinct combinations do not fit in memory.
+    Memory is bounded by the sketch sizes, whatever the number of rolls or of distinct combinations:
+        - a Space-Saving table keeps the capacity most frequent combinations with their count
+        and the maximum overestimate of that count,
+        - a Count-Min sketch of depth rows by width counters gives a second upper bound of each count,
+        - a HyperLogLog of 2 ** precision registers estimates the number of distinct combinations.
+    Each chunk is first counted exactly, then merged into the table, so a combination rolled more often than
+    the roll count divided by capacity is guaranteed to be kept.
+    """
+    _game = None
+    roll_count = 0
+    combo_df = None
+    distinct_combos = None
+    distinct_combos_error = None
+    unlisted_max_count = 0
+
+    def __init__(self, game, capacity=1000, width=1 << 16, depth=4, precision=14, seed=0):
+        """
+        INPUT:
+            game: the game whose chunks will be consumed
+            capacity: number of combinations kept in the Space-Saving table
+            width: number of counters in each row of the Count-Min sketch, a power of two
+            depth: number of rows of the Count-Min sketch
+            precision: log2 of the number of HyperLogLog registers
+            seed: seed of the Count-Min hash functions
+        """
+        self._game = game
+        self._capacity = capacity
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._counts = np.empty(0, dtype=np.int64)
+        self._errors = np.empty(0, dtype=np.int64)
+        self._rows = np.empty((0, len(game._dice_list)), dtype=_code_dtype(game._face_table.shape[0]))
+        self._width_bits = int(np.log2(width))
+        self._hash_multipliers = np.random.default_rng(seed).integers(0, 1 << 63, depth, dtype=np.uint64) * 2 + 1
+        self._count_min = np.zeros((depth, 1 << self._width_bits), dtype=np.int64)
+        self._precision = precision
+        self._registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, codes):
+        """
+        Consumes the next chunk of rolls and merges its combinations into the sketches.
+
+        INPUT:
+            codes: face code matrix yielded by Game.play_iter
+        """
+        keys, first_rolls, counts = np.unique(_row_hashes(codes), return_index=True, return_counts=True)
+        for row, multiplier in enumerate(self._hash_multipliers):
+            self._count_min[row] += np.bincount(self._count_min_index(keys, multiplier), weights=counts,
+                                                minlength=self._count_min.shape[1]).astype(np.int64)
+        register_bits = 64 - self._precision
+        registers = (keys >> np.uint64(register_bits)).astype(np.int64)
+        ranks = np.minimum(_leading_zeros(keys << np.uint64(self._precision)), register_bits) + 1
+        np.maximum.at(self._registers, registers, ranks.astype(np.uint8))
+        self._merge(keys, counts, codes[first_rolls])
+        self.roll_count = self.roll_count + codes.shape[0]
+        self.combo_df = None
+
+    def _merge(self, keys, counts, rows):
+        """
+        Merges the exact counts of a chunk into the Space-Saving table. A combination new to a full table
+        may have been rolled up to the smallest count of the table before, which becomes its error.
+        Only the capacity largest counts are kept, so no combination left out was rolled more than
+        the smallest count kept.
+        """
+        floor = self._counts.min() if self._keys.shape[0] >= self._capacity else 0
+        order = np.argsort(self._keys)
+        positions = np.minimum(np.searchsorted(self._keys[order], keys), max(order.shape[0] - 1, 0))
+        found = self._keys[order][positions] == keys if order.shape[0] else np.zeros(keys.shape, dtype=bool)
+        self._counts[order[positions[found]]] += counts[found]
+        new = ~found
+        self._keys = np.concatenate([self._keys, keys[new]])
+        self._counts = np.concatenate([self._counts, counts[new] + floor])
+        self._errors = np.concatenate([self._errors, np.full(new.sum(), floor, dtype=np.int64)])
+        self._rows = np.concatenate([self._rows, rows[new]])
+        if self._keys.shape[0] > self._capacity:
+            kept = np.argpartition(-self._counts, self._capacity - 1)[:self._capacity]
+            self.unlisted_max_count = max(self.unlisted_max_count, int(np.delete(self._counts, kept).max()))
+            self._keys, self._counts = self._keys[kept], self._counts[kept]
+            self._errors, self._rows = self._errors[kept], self._rows[kept]
+
+    def _count_min_index(self, keys, multiplier):
+        """
+        Returns the counter of each key in one row of the Count-Min sketch, by multiply-shift hashing
+        """
+        return ((keys * multiplier) >> np.uint64(64 - self._width_bits)).astype(np.int64)
+
+    def result(self, top_k=None):
+        """
+        Stores the top_k most frequent combinations seen so far (all of the table when None) in the combo_df
+        attribute, with the same layout as Analyzer.combo_df, and returns it.
+        The count column is an upper bound of the number of rolls of each combination, the smaller of the
+        Space-Saving and Count-Min estimates, and count_lower a guaranteed lower bound.
+        Also stores the estimated number of distinct combinations in distinct_combos,
+        with its relative standard error in distinct_combos_error.
+        """
+        upper = self._counts.copy()
+        for row, multiplier in enumerate(self._hash_multipliers):
+            upper = np.minimum(upper, self._count_min[row][self._count_min_index(self._keys, multiplier)])
+        top = np.argsort(-upper, kind='stable')[:top_k]
+        face_table = self._game._face_table
+        self.combo_df = _combo_frame(face_table, self._rows[top], upper[top])
+        self.combo_df['count_lower'] = _combo_frame(face_table, self._rows[top], (self._counts - self._errors)[top],
+                                                    'count_lower')['count_lower'].to_numpy()
+        registers = self._registers.shape[0]
+        estimate = 0.7213 / (1 + 1.079 / registers) * registers ** 2 / np.sum(2.0 ** -self._registers.astype(np.float64))
+        empty = np.count_nonzero(self._registers == 0)
+        if estimate <= 2.5 * registers and empty > 0:
+            estimate = registers * np.log(registers / empty)
+        self.distinct_combos = int(round(estimate))
+        self.distinct_combos_error = 1.04 / np.sqrt(registers)
+        return self.combo_df
+
+
+class GameSummary:
+    """
+    A compact summary of the rolls of a game, for simulations split across processes or machines:
+    the number of rolls, the jackpots rolled for each face, the count of each combination rolled
+    and, for each face, a histogram of how many rolls showed it 0, 1, ... M times (M dice).
+    No roll is kept, so a summary is small enough to be sent between machines, either pickled or with save and load.
+    Summaries of shards played separately are combined with merge, which is associative and does not depend on the
+    order of the shards, and the combined summary gives the statistics the Analyzer would give on all of the rolls.
+    """
+    roll_count = 0
+    jackpot_df = None
+    combo_df = None
+    face_counts_df = None
+
+    def __init__(self, game):
+        """
+        Creates an empty summary for the dice of game; rolls are added with update, or with Game.summary
+
+        INPUT:
+            game: the game whose rolls will be summarized
+        """
+        self._face_table = game._face_table
+        self._order = game._face_order()
+        dice_count = len(game._dice_list)
+        self._rows = np.empty((0, dice_count), dtype=_code_dtype(self._face_table.shape[0]))
+        self._counts = np.empty(0, dtype=np.int64)
+        self._histogram = np.zeros((self._face_table.shape[0], dice_count + 1), dtype=np.int64)
+        self._jackpots = np.zeros(self._face_table.shape[0], dtype=np.int64)
+
+    def update(self, codes):
+        """
+        Adds a chunk of rolls to the summary
+
+        INPUT:
+            codes: face code matrix of the game, e.g. yielded by Game.play_iter
+        """
+        face_count = self._face_table.shape[0]
+        jackpot_rolls = _jackpot_mask(codes)
+        self._jackpots += np.bincount(codes[jackpot_rolls, 0], minlength=face_count)
+        rows, counts = _unique_rows(codes, face_count)
+        self._rows, self._counts = _unique_rows(np.concatenate([self._rows, rows]), face_count,
+                                                np.concatenate([self._counts, counts]))
+        bins = self._histogram.shape[1]
+        flat = _face_counts(codes, face_count) + (np.arange(face_count, dtype=np.int64) * bins)[None, :]
+        self._histogram += np.bincount(flat.ravel(), minlength=face_count * bins).reshape(face_count, bins)
+        self.roll_count = self.roll_count + codes.shape[0]
+        self.jackpot_df = self.combo_df = self.face_counts_df = None
+
+    def merge(self, other):
+        """
+        Combines two summaries of games with the same number of dice into a new summary of all of their rolls.
+        The face tables of the two summaries are joined, so shards may have rolled different faces;
+        the faces are shown in the order of this summary, followed by the faces only the other one has.
+
+        INPUT:
+            other: GameSummary to combine with this one
+
+        OUTPUT:
+            summary: new GameSummary, neither summary is changed
+        """
+        if self._rows.shape[1] != other._rows.shape[1]:
+            raise ValueError("Cannot merge summaries of games with different numbers of dice")
+        face_table = np.union1d(self._face_table, other._face_table)
+        face_count = face_table.shape[0]
+        maps = [np.searchsorted(face_table, summary._face_table) for summary in (self, other)]
+        merged = GameSummary.__new__(GameSummary)
+        merged._face_table = face_table
+        order = np.concatenate([maps[0][self._order], maps[1][other._order]])
+        merged._order = order[np.sort(np.unique(order, return_index=True)[1])]
+        rows = np.concatenate([maps[0][self._rows], maps[1][other._rows]]).astype(_code_dtype(face_count))
+        merged._rows, merged._counts = _unique_rows(rows, face_count, np.concatenate([self._counts, other._counts]))
+        merged._histogram = np.zeros((face_count, self._histogram.shape[1]), dtype=np.int64)
+        merged._jackpots = np.zeros(face_count, dtype=np.int64)
+        for summary, face_map in zip((self, other), maps):
+            merged._histogram[face_map] += summary._histogram
+            merged._jackpots[face_map] += summary._jackpots
+        merged.roll_count = self.roll_count + other.roll_count
+        return merged
+
+    def jackpot(self):
+        """
+        Returns the number of jackpots, and stores the number of jackpots of each face in the jackpot_df attribute,
+        a dataframe indexed like combo_df (one level per die) with a count column
+        """
+        faces = np.flatnonzero(self._jackpots)
+        rows = np.repeat(faces[:, None], self._rows.shape[1], axis=1)
+        self.jackpot_df = _combo_frame(self._face_table, rows, self._jackpots[faces])
+        return int(self._jackpots.sum())
+
+    def combo(self):
+        """
+        Stores the combinations rolled and their counts in the combo_df attribute,
+        with the same layout as Analyzer.combo_df, and returns it
+        """
+        self.combo_df = _combo_frame(self._face_table, self._rows, self._counts)
+        return self.combo_df
+
+    def face_counts(self):
+        """
+        Stores the face count histograms in the face_counts_df attribute, with the same layout as
+        FaceCountsAccumulator.face_counts_df, and returns it
+        """
+        self.face_counts_df = _pd().DataFrame(self._histogram[self._order].T, columns=self._face_table[self._order],
+                                              index=_pd().Index(np.arange(self._histogram.shape[1]), name='face_count'))
+        return self.face_counts_df
+
+    def face_totals(self):
+        """
+        Returns a series with the total number of times each face was rolled
+        """
+        totals = self._histogram[self._order] @ np.arange(self._histogram.shape[1])
+        return _pd().Series(totals, index=self._face_table[self._order], name='count')
+
+    def save(self, path):
+        """
+        Saves the summary to the file path, in numpy's .npz format
+        """
+        np.savez(path, format_version=SAVE_FORMAT_VERSION, roll_count=self.roll_count, face_table=self._face_table,
+                 order=self._order, rows=self._rows, counts=self._counts, histogram=self._histogram,
+                 jackpots=self._jackpots)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a summary saved with save. Summaries saved in a newer format than SAVE_FORMAT_VERSION are refused.
+
+        OUTPUT:
+            summary: GameSummary object
+        """
+        with np.load(path) as arrays:
+            if int(arrays['format_version']) > SAVE_FORMAT_VERSION:
+                raise ValueError("Summary saved in format version " + str(int(arrays['format_version'])) +
+                                 ", this version of montecarlo reads up to " + str(SAVE_FORMAT_VERSION))
+            summary = cls.__new__(cls)
+            summary._face_table = arrays['face_table']
+            summary._order = arrays['order']
+            summary._rows = arrays['rows']
+            summary._counts = arrays['counts']
+            summary._histogram = arrays['histogram']
+            summary._jackpots = arrays['jackpots']
+            summary.roll_count = int(arrays['roll_count'])
+        return summary
+
+
+class SimulationQueue:
+    """
+    Serves the simulation requests of an asyncio service, coalescing concurrent requests for identical dice:
+    while a game of the same faces, weights and roll count is being simulated, further requests for it
+    wait for that simulation instead of starting their own, and all of them get the same results.
+    Only requests in flight are coalesced, a request made after a simulation finished starts a new one.
+    A shared simulation keeps running when one of its callers is cancelled, so the other callers still get it.
+    """
+    _jobs = None
+    chunk_size = 1000000
+
+    def __init__(self, chunk_size=1000000):
+        """
+        INPUT:
+            chunk_size: Maximum number of rolls drawn per call to the managed executor, see Game.play_async
+        """
+        self._jobs = {}
+        self.chunk_size = chunk_size
+
+    async def play(self, dice_list, roll_count):
+        """
+        Plays a game of dice_list roll_count times, or waits for the identical game already being played,
+        and returns the played Game. The game is shared by the coalesced requests and should not be played again.
+        """
+        async def job():
+            game = Game(dice_list)
+            await game.play_async(roll_count, self.chunk_size)
+            return game
+
+        return await self._run(('play', self._dice_key(dice_list), roll_count), job)
+
+    async def jackpot(self, dice_list, roll_count):
+        """
+        Returns the number of jackpots of a game of dice_list played roll_count times, see Analyzer.jackpot
+        """
+        async def job():
+            return await Analyzer(await self.play(dice_list, roll_count)).jackpot_async()
+
+        return await self._run(('jackpot', self._dice_key(dice_list), roll_count), job)
+
+    async def combo(self, dice_list, roll_count):
+        """
+        Returns the combo dataframe of a game of dice_list played roll_count times, see Analyzer.combo
+        """
+        async def job():
+            return await Analyzer(await self.play(dice_list, roll_count)).combo_async()
+
+        return await self._run(('combo', self._dice_key(dice_list), roll_count), job)
+
+    async def _run(self, key, job):
+        """
+        Awaits the task in flight under key, starting job as that task if there is none
+        """
+        import asyncio
+        task = self._jobs.get(key)
+        if task is None:
+            task = asyncio.ensure_future(job())
+            self._jobs[key] = task
+            task.add_done_callback(lambda finished: self._jobs.pop(key, None))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _dice_key(dice_list):
+        """
+        Returns a hashable key that is equal for two lists of dice of the same class with the same faces, weights
+        and, for Markov dice, transition weights in the same order
         """
-        game_results_df_long = self._game.show(wide=False)
-        game_results_df_long.reset_index(inplace=True)
-        roll_face_value_count_summary = game_results_df_long.\
-            groupby(['roll_number', 'face_value']).agg(count=("dice_number_or_id", 'count'))
-        roll_face_value_count_summary.reset_index(inplace=True)
-        roll_number_list = self._game.show(wide=True).index.values.tolist()
-        self.face_counts_per_roll_df = pd.DataFrame(data={**{face:["" for i in roll_number_list] for face in self._faces},**{"roll_number": roll_number_list}})
-        self.face_counts_per_roll_df.reset_index( inplace=True)
-        self.face_counts_per_roll_df.set_index('roll_number', inplace=True)
-        for face_value in self._faces:
-            for j in self.face_counts_per_roll_df.index.values.tolist():
-                if int(roll_face_value_count_summary[(roll_face_value_count_summary['roll_number']==j) & (roll_face_value_count_summary['face_value'] == str(face_value))]["count"].shape[0]) == 0:
-                    self.face_counts_per_roll_df.at[j, str(face_value)] = 0
-                else:
-                    self.face_counts_per_roll_df.at[j, str(face_value)] = roll_face_value_count_summary[(roll_face_value_count_summary.index.isin([j])) & (roll_face_value_count_summary["face_value"] == str(face_value))]["count"]
-                    #self.face_counts_per_roll_df.drop("index", inplace=True)
-        self.face_counts_per_roll_df.reset_index(inplace=True)
-        self.face_counts_per_roll_df.drop("index", inplace=True, axis=1)
-        self.face_counts_per_roll_df.set_index("roll_number", inplace=True, )
+        return tuple((type(dice), dice._faces.dtype.str, dice._faces.tobytes(), dice._w.tobytes(),
+                      dice._transitions.tobytes() if isinstance(dice, MarkovDie) else None) for dice in dice_list)
@@ -0,0 +1,337 @@
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from montecarlo import Die, Game, Analyzer, BIT_GENERATORS, sweep
+
+# The README scenario (5 fair dice rolled 10,000 times), a small sweep for quick checks,
+# and the same sweep scaled up to production sizes.
+SUITES = {
+    'readme': {'face_counts': (6,), 'dice_counts': (5,), 'roll_counts': (10000,)},
+    'quick': {'face_counts': (6, 64), 'dice_counts': (2, 5), 'roll_counts': (10000, 100000)},
+    'production': {'face_counts': (6, 26, 1000), 'dice_counts': (5, 20), 'roll_counts': (1000000, 10000000)},
+}
+HOT_PATHS = ('die_roll', 'game_play', 'game_show_narrow', 'analyzer_jackpot', 'analyzer_combo', 'analyzer_face_counts')
+# analyzer_face_counts builds a (rolls, faces) int64 matrix, points with more cells are skipped
+FACE_COUNTS_MAX_CELLS = 10 ** 8
+
+
+def time_call(function, repeat=3):
+    """
+    Runs a function repeat times and returns the best wall time in seconds
+    """
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(setup, run, repeat=3):
+    """
+    Measures one hot path. setup builds a fresh state for each call so that cached results are never reused,
+    and is not timed. The best wall time of repeat calls is kept; the peak memory allocated by run
+    is traced in one extra call, since tracing slows the call down.
+
+    INPUT:
+        setup: function without arguments returning the state passed to run
+        run: function taking the state
+        repeat: number of timed calls
+
+    OUTPUT:
+        seconds: best wall time of run
+        peak_bytes: peak memory allocated while run was running
+    """
+    seconds = float('inf')
+    for i in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        seconds = min(seconds, time.perf_counter() - start)
+    state = setup()
+    tracemalloc.start()
+    run(state)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak_bytes
+
+
+def _played_game(face_count, dice_count, roll_count, seed):
+    """
+    Returns a game of dice_count fair dice with face_count integer faces, played roll_count times
+    """
+    game = Game([Die(np.arange(1, face_count + 1, dtype=np.int64)) for i in range(dice_count)])
+    game.play(roll_count, rng=seed)
+    return game
+
+
+def _replayed(game):
+    """
+    Stores the game's results again as if they came from a new play, dropping the dataframes decoded from them
+    """
+    game._store(game._codes)
+    return game
+
+
+def _hot_path(path, face_count, dice_count, roll_count, seed):
+    """
+    Returns the (setup, run) pair that measure uses for one hot path
+    """
+    dice = Die(np.arange(1, face_count + 1, dtype=np.int64))
+    if path == 'die_roll':
+        return lambda: np.random.default_rng(seed), lambda rng: dice.roll(roll_count, rng=rng)
+    if path == 'game_play':
+        return (lambda: Game([dice] * dice_count)), lambda game: game.play(roll_count, rng=seed)
+    game = _played_game(face_count, dice_count, roll_count, seed)
+    if path == 'game_show_narrow':
+        return lambda: _replayed(game), lambda played: played.show(wide=False)
+    analyzer_methods = {'analyzer_jackpot': Analyzer.jackpot, 'analyzer_combo': Analyzer.combo,
+                        'analyzer_face_counts': Analyzer.face_counts_per_roll}
+    return (lambda: Analyzer(game)), analyzer_methods[path]
+
+
+def benchmark_hot_paths(face_counts, dice_counts, roll_counts, paths=HOT_PATHS, repeat=3, seed=0):
+    """
+    Sweeps face count, dice count and roll count over the hot paths of Die, Game and Analyzer.
+    A roll is one roll of every die of the game (one face for die_roll).
+    die_roll is measured once per face count and roll count, and analyzer_face_counts is skipped
+    when rolls times faces is above FACE_COUNTS_MAX_CELLS.
+
+    INPUT:
+        face_counts, dice_counts, roll_counts: values swept, every combination is benchmarked
+        paths: hot paths to benchmark, from HOT_PATHS
+        repeat: number of timed calls, the best one is kept
+        seed: seed of the games
+
+    OUTPUT:
+        results: dataframe with one row per hot path and sweep point, with the wall time,
+        the peak memory and the rolls per second
+    """
+    rows = []
+    for face_count, dice_count, roll_count in itertools.product(face_counts, dice_counts, roll_counts):
+        for path in paths:
+            if path == 'die_roll' and dice_count != dice_counts[0]:
+                continue
+            if path == 'analyzer_face_counts' and face_count * roll_count > FACE_COUNTS_MAX_CELLS:
+                continue
+            seconds, peak_bytes = measure(*_hot_path(path, face_count, dice_count, roll_count, seed), repeat=repeat)
+            rows.append({'path': path, 'face_count': face_count, 'dice_count': 1 if path == 'die_roll' else dice_count,
+                         'roll_count': roll_count, 'seconds': seconds, 'peak_bytes': peak_bytes,
+                         'rolls_per_second': roll_count / seconds if seconds > 0 else float('inf')})
+    return pd.DataFrame(rows)
+
+
+def benchmark_samplers(face_counts=(2, 6, 16, 64, 256, 1024, 4096, 16384, 65536, 262144),
+                       roll_count=1000000, repeat=3, seed=0):
+    """
+    Compares the 'cdf' and 'alias' sampling backends of Die across face counts.
+    Each die gets random weights; the alias table setup is timed on its own, since it is paid once per weight change.
+
+    INPUT:
+        face_counts: numbers of faces to benchmark
+        roll_count: number of rolls per timed roll call
+        repeat: number of timed calls, the best one is kept
+        seed: seed of the weights and the rolls
+
+    OUTPUT:
+        results: dataframe indexed by face count with the seconds per roll call of each backend,
+        the alias setup time and the backend 'auto' picks for a roll of roll_count
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for face_count in face_counts:
+        weights = rng.random(face_count) + 0.01
+        dice = {}
+        for sampler in ('cdf', 'alias', 'auto'):
+            dice[sampler] = Die(np.arange(face_count, dtype=np.int64), sampler=sampler)
+            dice[sampler]._w[:] = weights
+        setup = time_call(lambda: (setattr(dice['alias'], '_alias', None), dice['alias']._alias_table()), repeat)
+        rows.append({'face_count': face_count,
+                     'cdf_seconds': time_call(lambda: dice['cdf'].roll(roll_count, rng=rng), repeat),
+                     'alias_seconds': time_call(lambda: dice['alias'].roll(roll_count, rng=rng), repeat),
+                     'alias_setup_seconds': setup,
+                     'auto_picks': 'alias' if dice['auto']._use_alias(roll_count) else 'cdf'})
+    return pd.DataFrame(rows).set_index('face_count')
+
+
+def benchmark_dynamic_weights(face_counts=(16, 1024, 65536), updates=200, rolls_per_update=10,
+                              repeat=3, seed=0):
+    """
+    Compares the sampling backends of Die on an adaptive workload, where one weight is changed
+    before every roll of rolls_per_update faces
+
+    OUTPUT:
+        results: dataframe indexed by face count with the seconds of the workload for each backend
+    """
+    rows = []
+    for face_count in face_counts:
+        rng = np.random.default_rng(seed)
+        faces = rng.integers(0, face_count, updates).tolist()
+        weights = rng.random(updates).tolist()
+        row = {'face_count': face_count}
+        for sampler in ('cdf', 'alias', 'fenwick'):
+            dice = Die(np.arange(face_count, dtype=np.int64), sampler=sampler)
+            dice.roll(1, rng=rng)
+
+            def workload():
+                for face, weight in zip(faces, weights):
+                    dice.change_weight(face, weight)
+                    dice.roll(rolls_per_update, rng=rng)
+
+            row[sampler + '_seconds'] = time_call(workload, repeat)
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('face_count')
+
+
+def benchmark_bit_generators(face_count=6, dice_count=5, roll_count=1000000, repeat=3, seed=0):
+    """
+    Compares the bit generators that Game.play accepts on one game
+
+    OUTPUT:
+        results: dataframe indexed by bit generator with the seconds per play and the rolls per second
+    """
+    game = Game([Die(np.arange(1, face_count + 1, dtype=np.int64)) for i in range(dice_count)])
+    rows = []
+    for bit_generator in BIT_GENERATORS:
+        seconds = time_call(lambda: game.play(roll_count, rng=seed, bit_generator=bit_generator), repeat)
+        rows.append({'bit_generator': bit_generator, 'seconds': seconds, 'rolls_per_second': roll_count / seconds})
+    return pd.DataFrame(rows).set_index('bit_generator')
+
+
+def benchmark_sweep(face_count=6, dice_count=5, roll_count=10000, config_counts=(10, 100, 1000), repeat=3, seed=0):
+    """
+    Compares sweep with the loop it replaces, which builds a Die, Game and Analyzer for each weight configuration
+
+    OUTPUT:
+        results: dataframe indexed by number of configurations with the seconds of the loop and of sweep
+    """
+    faces = np.arange(1, face_count + 1, dtype=np.int64)
+    rows = []
+    for config_count in config_counts:
+        weights = np.random.default_rng(seed).random((config_count, face_count)) + 0.01
+
+        def loop():
+            for config_weights in weights:
+                dice = Die(faces)
+                for face, weight in zip(faces.tolist(), config_weights.tolist()):
+                    dice.change_weight(face, weight)
+                game = Game([dice] * dice_count)
+                game.play(roll_count, rng=seed)
+                Analyzer(game).jackpot()
+
+        rows.append({'config_count': config_count, 'loop_seconds': time_call(loop, repeat),
+                     'sweep_seconds': time_call(lambda: sweep(faces, weights, dice_count, roll_count, seed=seed), repeat)})
+    return pd.DataFrame(rows).set_index('config_count')
+
+
+def benchmark_import(repeat=5):
+    """
+    Measures the cold start of a fresh interpreter importing numpy alone, importing montecarlo,
+    and importing montecarlo then playing a small game, which should not import pandas.
+    The interpreter startup itself is measured with an empty script and subtracted.
+
+    OUTPUT:
+        results: dataframe indexed by script with the best seconds over repeat runs
+        and whether pandas was imported by the script
+    """
+    scripts = {'numpy': 'import numpy',
+               'montecarlo': 'import montecarlo',
+               'montecarlo_play': 'import montecarlo, numpy; '
+                                  'game = montecarlo.Game([montecarlo.Die(numpy.arange(6))] * 5); game.play(1000)'}
+    check = '; import sys; print("pandas" in sys.modules)'
+    startup = time_call(lambda: subprocess.run([sys.executable, '-c', 'pass']), repeat)
+    rows = []
+    for name, script in scripts.items():
+        seconds = time_call(lambda: subprocess.run([sys.executable, '-c', script]), repeat)
+        pandas_loaded = subprocess.run([sys.executable, '-c', script + check], capture_output=True, text=True).stdout
+        rows.append({'script': name, 'seconds': seconds - startup, 'pandas_imported': pandas_loaded.strip() == 'True'})
+    return pd.DataFrame(rows).set_index('script')
+
+
+def metadata():
+    """
+    Returns the environment a benchmark ran in, so results of different commits and machines can be told apart
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(),
+            'processor': platform.processor()}
+
+
+def save_results(results, path):
+    """
+    Saves a hot path results dataframe as JSON, along with the metadata of the run
+    """
+    with open(path, 'w') as results_file:
+        json.dump({'metadata': metadata(), 'results': results.to_dict(orient='records')}, results_file, indent=2)
+
+
+def load_results(path):
+    """
+    Loads a hot path results dataframe saved by save_results
+    """
+    with open(path) as results_file:
+        return pd.DataFrame(json.load(results_file)['results'])
+
+
+def compare_results(baseline, current, threshold=1.2):
+    """
+    Compares two hot path results dataframes point by point.
+
+    INPUT:
+        baseline: results of the reference commit
+        current: results of the commit being checked
+        threshold: ratio of current to baseline wall time above which a point is flagged as a regression
+
+    OUTPUT:
+        comparison: dataframe with the wall times, peak memory of both runs, their ratio and a regression flag
+    """
+    keys = ['path', 'face_count', 'dice_count', 'roll_count']
+    comparison = baseline[keys + ['seconds', 'peak_bytes']].merge(
+        current[keys + ['seconds', 'peak_bytes']], on=keys, suffixes=('_baseline', '_current'))
+    comparison['time_ratio'] = comparison['seconds_current'] / comparison['seconds_baseline']
+    comparison['regression'] = comparison['time_ratio'] > threshold
+    return comparison
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths of Die, Game and Analyzer')
+    parser.add_argument('--suite', default='readme', choices=list(SUITES) + ['samplers', 'dynamic_weights', 'bit_generators', 'sweep', 'import'])
+    parser.add_argument('--paths', nargs='+', default=list(HOT_PATHS), choices=HOT_PATHS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON file the hot path results are saved to')
+    parser.add_argument('--compare', help='JSON file of a previous run to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+    pd.set_option('display.width', 200)
+    if args.suite == 'samplers':
+        print(benchmark_samplers(repeat=args.repeat))
+    elif args.suite == 'dynamic_weights':
+        print(benchmark_dynamic_weights(repeat=args.repeat))
+    elif args.suite == 'bit_generators':
+        print(benchmark_bit_generators(repeat=args.repeat))
+    elif args.suite == 'sweep':
+        print(benchmark_sweep(repeat=args.repeat))
+    elif args.suite == 'import':
+        print(benchmark_import(repeat=args.repeat))
+    else:
+        results = benchmark_hot_paths(paths=args.paths, repeat=args.repeat, **SUITES[args.suite])
+        print(results.to_string(index=False))
+        if args.output:
+            save_results(results, args.output)
+        if args.compare:
+            comparison = compare_results(load_results(args.compare), results, args.threshold)
+            print(comparison.to_string(index=False))
+            if comparison['regression'].any():
+                raise SystemExit("Regressions found")
@@ -1,3 +1,9 @@
+import asyncio
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
 import unittest as u
 from unittest.mock import patch
 import numpy as np
@@ -6,6 +12,13 @@ from montecarlo import Die
 from io import StringIO
 from montecarlo import Game
 from montecarlo import Analyzer
+from montecarlo import JackpotAccumulator, ComboAccumulator, FaceCountsAccumulator
+from montecarlo import Metrics
+from montecarlo import sweep
+from montecarlo import SimulationQueue
+from montecarlo import ComboSketch
+from montecarlo import MarkovDie
+from montecarlo import GameSummary
 
 
 class MontecarloSuite(u.TestCase):
@@ -55,6 +68,12 @@ class MontecarloSuite(u.TestCase):
         with patch('sys.stdout', new=StringIO()) as fake_out:
             dice.change_weight(1, 'notanumricalstring')
             self.assertEqual(fake_out.getvalue(), "Weight not numerical, please enter a numerical weight\n")
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            dice.change_weight(2, -1)
+            dice.change_weight(3, float('nan'))
+            dice.change_weight(4, float('inf'))
+            self.assertEqual(fake_out.getvalue(), "Weight negative or not finite, please enter a non-negative weight\n" * 3)
+        self.assertEqual([1.0] * 6, dice._w.tolist())
 
     def test_6_change_weight_rejects_face(self):
         """
@@ -71,7 +90,7 @@ class MontecarloSuite(u.TestCase):
         """
         dice = Die(np.array(['H', 'T'], dtype=np.str_))
         dice.change_weight('T', 0)
-        self.assertEqual(dice.roll(2), ['H', 'H'])
+        self.assertEqual(dice.roll(2, as_list=True), ['H', 'H'])
 
     def test_8_roll_three_times(self):
         """
@@ -81,6 +100,17 @@ class MontecarloSuite(u.TestCase):
         dice.change_weight('T', 0)
         self.assertEqual(len(dice.roll(3)), 3)
 
+    def test_8b_roll_returns_array(self):
+        """
+            Tests whether roll returns a numpy array of faces by default and never picks a zero weight face
+        """
+        dice = Die(np.array([1, 2, 3, 4, 5, 6], dtype=np.int64))
+        dice.change_weight(6, 0)
+        outcomes = dice.roll(1000)
+        self.assertIsInstance(outcomes, np.ndarray)
+        self.assertEqual(1000, outcomes.shape[0])
+        self.assertEqual({1, 2, 3, 4, 5}, set(outcomes.tolist()))
+
     def test_9_show_die(self):
         """
             Tests show returns the _dice object
@@ -88,6 +118,16 @@ class MontecarloSuite(u.TestCase):
         dice = Die(np.array(['H', 'T'], dtype=np.str_))
         self.assertEqual(True, dice._dice.equals(dice.show()))
 
+    def test_9b_die_arrays(self):
+        """
+            Tests the die keeps its faces and weights in numpy arrays without a per-instance dict
+        """
+        dice = Die(np.array(['H', 'T'], dtype=np.str_))
+        dice.change_weight('T', 3)
+        self.assertFalse(hasattr(dice, '__dict__'))
+        self.assertEqual([1.0, 3.0], dice._w.tolist())
+        self.assertEqual(1, dice._face_index['T'])
+
     def test_10_game_init(self):
         """
             Test whether the game initializer successfully sets the dice list variable
@@ -146,6 +186,21 @@ class MontecarloSuite(u.TestCase):
         game.play(2)
         self.assertEqual('roll_number', game._dice_rolls.index.name)
 
+    def test_14b_play_face_codes(self):
+        """
+            Test whether the game play function stores the results as a uint8 face code matrix with a shared face table
+        """
+        d1 = Die(np.array(['H', 'T'], dtype=np.str_))
+        d1.change_weight('H', 0.0)
+        d2 = Die(np.array(['T', 'H'], dtype=np.str_))
+        d2.change_weight('T', 0.0)
+        game = Game([d1, d2])
+        game.play(4)
+        self.assertEqual(['H', 'T'], game._face_table.tolist())
+        self.assertEqual(np.uint8, game._codes.dtype)
+        self.assertEqual([[1, 0]] * 4, game._codes.tolist())
+        self.assertEqual([['T', 'H']] * 4, game.show().values.tolist())
+
     def test_15_game_show_wide(self):
         """
             Test whether the game show method returns a wide dataframe with roll-game results when wide = 1, True, or default
@@ -183,8 +238,8 @@ class MontecarloSuite(u.TestCase):
 
             Index
             _______________________________      face_value
-            roll_number  dice_number_or_id        face value of input die (str here)
-            int               str
+            roll_number  dice_number_or_id        face value of input die (categorical of the faces)
+            int               categorical
             1                  1                      H
             1                  2                      T
             2                  1                      H
@@ -200,8 +255,8 @@ class MontecarloSuite(u.TestCase):
         narrow_df = pd.DataFrame({'roll_number': [1, 1, 2, 2], 'dice_number_or_id': ['1', '2', '1', '2'],
                                   'face_value': ['H', 'T', 'H', 'T']})
         narrow_df['roll_number'] = narrow_df['roll_number'].astype(int)
-        narrow_df['dice_number_or_id'] = narrow_df['dice_number_or_id'].astype(str)
-        narrow_df['face_value'] = narrow_df['face_value'].astype(str)
+        narrow_df['dice_number_or_id'] = narrow_df['dice_number_or_id'].astype('category')
+        narrow_df['face_value'] = pd.Categorical(narrow_df['face_value'], categories=['H', 'T'])
         narrow_df.set_index(['roll_number', 'dice_number_or_id'], inplace=True)
         pd.testing.assert_frame_equal(game.show(wide=0), narrow_df, check_names=True, check_index_type=True,
                                       check_column_type=True)
@@ -316,12 +371,597 @@ class MontecarloSuite(u.TestCase):
         game = Game([d1, d2, d3])
         game.play(3)
         analyzer_bot = Analyzer(game)
-        model_df = pd.DataFrame({'H': [3, 3, 3], 'T': [0, 0, 0], 'roll_number': [1, 2, 3]}, dtype=object)
+        model_df = pd.DataFrame({'H': [3, 3, 3], 'T': [0, 0, 0], 'roll_number': [1, 2, 3]}, dtype=np.int64)
         model_df.set_index('roll_number', inplace=True)
         analyzer_bot.face_counts_per_roll()
         pd.testing.assert_frame_equal(model_df, analyzer_bot.face_counts_per_roll_df, check_names=True,
                                       check_index_type=True, check_column_type=True)
 
+    def test_24_play_iter_chunks(self):
+        """
+        Test that play_iter yields chunks of at most chunk_size rolls adding up to the roll count
+        and leaves the most recent play untouched
+        """
+        game = Game([Die(np.array([1, 2, 3, 4, 5, 6], dtype=np.int64)) for i in range(3)])
+        chunks = list(game.play_iter(10, chunk_size=4))
+        self.assertEqual([(4, 3), (4, 3), (2, 3)], [chunk.shape for chunk in chunks])
+        self.assertIsNone(game._dice_rolls)
+
+    def test_25_accumulators_match_analyzer(self):
+        """
+        Test that the accumulators fed a game in two chunks reproduce the analyzer dataframes for the whole game
+        """
+        game = Game([Die(np.array(['H', 'T'], dtype=np.str_)) for i in range(3)])
+        game.play(50)
+        analyzer_bot = Analyzer(game)
+        jackpots = analyzer_bot.jackpot()
+        analyzer_bot.combo()
+        jackpot_acc, combo_acc, face_acc = JackpotAccumulator(game), ComboAccumulator(game), FaceCountsAccumulator(game)
+        for chunk in (game._codes[:20], game._codes[20:]):
+            jackpot_acc.update(chunk)
+            combo_acc.update(chunk)
+            face_acc.update(chunk)
+        self.assertEqual(jackpots, jackpot_acc.result())
+        pd.testing.assert_frame_equal(analyzer_bot.jackpot_df, jackpot_acc.jackpot_df)
+        pd.testing.assert_frame_equal(analyzer_bot.combo_df, combo_acc.result())
+        self.assertEqual([50, 50], face_acc.result().sum().tolist())
+        self.assertEqual((game.show() == 'H').values.sum(), face_acc.face_totals()['H'])
+
+    def test_26_play_parallel_reproducible(self):
+        """
+        Test that a parallel play gives identical results for the same seed and number of workers
+        """
+        game = Game([Die(np.array([1, 2, 3, 4, 5, 6], dtype=np.int64)) for i in range(3)])
+        game.play_parallel(1001, workers=2, seed=7)
+        first_results = game.show().copy()
+        game.play_parallel(1001, workers=2, seed=7)
+        pd.testing.assert_frame_equal(first_results, game.show())
+        self.assertEqual(list(range(1, 1002)), game.show().index.tolist())
+        game.play_parallel(1001, workers=2, seed=8)
+        self.assertFalse(first_results.equals(game.show()))
+        game.play_parallel(1001, workers=2, seed=np.random.default_rng(7))
+        generator_results = game.show().copy()
+        game.play_parallel(1001, workers=2, seed=np.random.default_rng(7))
+        pd.testing.assert_frame_equal(generator_results, game.show())
+        weights = np.ones((2, 6))
+        pd.testing.assert_frame_equal(sweep(np.arange(6), weights, 2, 100, seed=np.random.default_rng(3)),
+                                      sweep(np.arange(6), weights, 2, 100, seed=np.random.default_rng(3)))
+
+    def test_27_seeded_roll(self):
+        """
+        Test that rolls drawn from the same seed and bit generator are identical
+        """
+        dice = Die(np.array([1, 2, 3, 4, 5, 6], dtype=np.int64))
+        self.assertEqual(dice.roll(20, rng=42).tolist(), dice.roll(20, rng=np.random.default_rng(42)).tolist())
+        self.assertEqual(dice.roll(20, rng=42, bit_generator='Philox').tolist(),
+                         dice.roll(20, rng=42, bit_generator='Philox').tolist())
+        self.assertRaises(ValueError, dice.roll, 20, rng=42, bit_generator='banana')
+
+    def test_28_seeded_play(self):
+        """
+        Test that games played and streamed from the same seed give identical results
+        """
+        game = Game([Die(np.array(['H', 'T'], dtype=np.str_)) for i in range(4)])
+        game.play(100, rng=3, bit_generator='SFC64')
+        first_results = game.show().copy()
+        game.play(100, rng=3, bit_generator='SFC64')
+        pd.testing.assert_frame_equal(first_results, game.show())
+        streamed = np.concatenate(list(game.play_iter(100, chunk_size=30, rng=3, bit_generator='SFC64')))
+        self.assertEqual(game._codes.shape, streamed.shape)
+
+    def test_29_alias_sampler(self):
+        """
+        Test that the alias backend follows the weights, never rolls a zero weight face
+        and is rebuilt after a weight change
+        """
+        dice = Die(np.arange(100, dtype=np.int64), sampler='alias')
+        dice.change_weight(0, 0)
+        dice.change_weight(1, 99.0)
+        outcomes = dice.roll(100000, rng=1)
+        self.assertNotIn(0, outcomes.tolist())
+        self.assertAlmostEqual(0.5, np.mean(outcomes == 1), places=2)
+        dice.change_weight(1, 0)
+        self.assertIsNone(dice._alias)
+        self.assertNotIn(1, dice.roll(1000, rng=1).tolist())
+        alias_table = dice._alias
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            dice.change_weight(2, -50.0)
+            self.assertEqual("Weight negative or not finite, please enter a non-negative weight\n", fake_out.getvalue())
+        self.assertIs(alias_table, dice._alias)
+        self.assertIn(2, dice.roll(10000, rng=1).tolist())
+
+    def test_30_auto_sampler(self):
+        """
+        Test that the automatic backend choice uses the alias table only for dice with many faces
+        """
+        self.assertFalse(Die(np.arange(6, dtype=np.int64))._use_alias(1000000))
+        self.assertTrue(Die(np.arange(1000, dtype=np.int64))._use_alias(1000000))
+        self.assertFalse(Die(np.arange(1000, dtype=np.int64))._use_alias(10))
+
+    def test_31_face_counts_per_roll_int_faces(self):
+        """
+        Test that the face counts of every roll add up to the number of dice and match the wide results
+        """
+        game = Game([Die(np.array([1, 2, 3, 4, 5, 6], dtype=np.int64)) for i in range(5)])
+        game.play(200, rng=11)
+        analyzer_bot = Analyzer(game)
+        analyzer_bot.face_counts_per_roll()
+        self.assertEqual([1, 2, 3, 4, 5, 6], analyzer_bot.face_counts_per_roll_df.columns.tolist())
+        self.assertTrue((analyzer_bot.face_counts_per_roll_df.sum(axis=1) == 5).all())
+        self.assertEqual((game.show() == 6).sum(axis=1).tolist(), analyzer_bot.face_counts_per_roll_df[6].tolist())
+
+    def test_32_analyzer_leaves_game_untouched(self):
+        """
+        Test that combo and jackpot do not change the game's results, whatever order they are called in
+        """
+        game = Game([Die(np.array(['H', 'T'], dtype=np.str_)) for i in range(3)])
+        game.play(40, rng=5)
+        wide_results = game.show().copy()
+        analyzer_bot = Analyzer(game)
+        analyzer_bot.combo()
+        jackpots = analyzer_bot.jackpot()
+        pd.testing.assert_frame_equal(wide_results, game.show())
+        self.assertEqual(['1', '2', '3'], analyzer_bot.jackpot_df.columns.tolist())
+        self.assertEqual(40, analyzer_bot.combo_df['count'].sum())
+        self.assertEqual(jackpots, analyzer_bot.combo_df.loc[[('H', 'H', 'H'), ('T', 'T', 'T')], 'count'].sum())
+
+    def test_33_analyzer_cache(self):
+        """
+        Test that repeated analyzer queries reuse the stored results until the game is played again
+        """
+        game = Game([Die(np.array([1, 2, 3, 4, 5, 6], dtype=np.int64)) for i in range(2)])
+        game.play(500, rng=1)
+        analyzer_bot = Analyzer(game)
+        combo_df = analyzer_bot.combo()
+        face_counts_df = analyzer_bot.face_counts_per_roll()
+        jackpots = analyzer_bot.jackpot()
+        self.assertIs(combo_df, analyzer_bot.combo())
+        self.assertIs(face_counts_df, analyzer_bot.face_counts_per_roll())
+        self.assertEqual(jackpots, int((game.show()['1'] == game.show()['2']).sum()))
+        game.play(300, rng=2)
+        self.assertIsNot(combo_df, analyzer_bot.combo())
+        self.assertEqual(300, analyzer_bot.combo()['count'].sum())
+        self.assertEqual(300, analyzer_bot.face_counts_per_roll().shape[0])
+        self.assertEqual(int((game.show()['1'] == game.show()['2']).sum()), analyzer_bot.jackpot())
+
+    def test_34_metrics(self):
+        """
+        Test that a game and its analyzer report phase timers and counters to the metrics and its sink
+        """
+        events = []
+        metrics = Metrics(sink=lambda kind, name, value: events.append((kind, name)))
+        game = Game([Die(np.array(['H', 'T'], dtype=np.str_)) for i in range(3)], metrics=metrics)
+        game.play(100, rng=1)
+        game.show()
+        game.show(wide=False)
+        analyzer_bot = Analyzer(game)
+        analyzer_bot.combo()
+        analyzer_bot.combo()
+        self.assertEqual(300, metrics.counters['rolls'])
+        self.assertEqual(1, metrics.calls['game.sample'])
+        self.assertIn('game.narrow', metrics.seconds)
+        self.assertEqual(1, metrics.counters['analyzer.cache_hits'])
+        self.assertIn(('phase', 'analyzer.combo_df'), events)
+        self.assertEqual('phase', metrics.report().loc['game.decode_wide', 'kind'])
+
+    def test_35_no_prints(self):
+        """
+        Test that playing and analyzing a game prints nothing
+        """
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            game = Game([Die(np.array(['H', 'T'], dtype=np.str_)) for i in range(2)])
+            game.play(10)
+            Die(np.array([1, 2], dtype=np.int64)).roll(3)
+            Analyzer(game).jackpot()
+            self.assertEqual('', fake_out.getvalue())
+
+    def test_36_save_load_mmap(self):
+        """
+        Test that a saved game loads back memory-mapped with the same dice and results,
+        and that an analyzer gives the same statistics on the loaded game
+        """
+        d1 = Die(np.array(['H', 'T'], dtype=np.str_))
+        d1.change_weight('T', 3.0)
+        game = Game([d1, Die(np.array(['T', 'H'], dtype=np.str_))])
+        game.play(1000, rng=4)
+        with tempfile.TemporaryDirectory() as path:
+            game.save(os.path.join(path, 'game'))
+            loaded = Game.load(os.path.join(path, 'game'), mmap=True)
+            self.assertIsInstance(loaded._codes, np.memmap)
+            self.assertEqual([1.0, 3.0], loaded._dice_list[0]._w.tolist())
+            self.assertEqual(['T', 'H'], loaded._dice_list[1]._faces.tolist())
+            pd.testing.assert_frame_equal(game.show(), loaded.show())
+            self.assertEqual(Analyzer(game).jackpot(), Analyzer(loaded).jackpot())
+            pd.testing.assert_frame_equal(Analyzer(game).combo(), Analyzer(loaded).combo())
+            loaded.save(os.path.join(path, 'game'))
+            pd.testing.assert_frame_equal(game.show(), Game.load(os.path.join(path, 'game')).show())
+            del loaded
+            with patch('montecarlo.SAVE_FORMAT_VERSION', 2):
+                game.save(os.path.join(path, 'newer'))
+            with self.assertRaises(ValueError):
+                Game.load(os.path.join(path, 'newer'))
+
+    def test_37_exact_jackpot_and_combo(self):
+        """
+        Test the exact jackpot probability and combination distribution of two loaded coins
+        """
+        d1 = Die(np.array(['H', 'T'], dtype=np.str_))
+        d1.change_weight('H', 3.0)
+        d2 = Die(np.array(['H', 'T'], dtype=np.str_))
+        analyzer_bot = Analyzer(Game([d1, d2]))
+        self.assertAlmostEqual(0.75 * 0.5 + 0.25 * 0.5, analyzer_bot.exact_jackpot())
+        self.assertEqual([('H', 'H'), ('T', 'T')], analyzer_bot.exact_jackpot_df.index.tolist())
+        combo_df = analyzer_bot.exact_combo()
+        self.assertEqual([('H', 'H'), ('H', 'T'), ('T', 'H'), ('T', 'T')], combo_df.index.tolist())
+        np.testing.assert_allclose([0.375, 0.375, 0.125, 0.125], combo_df['probability'].to_numpy())
+        self.assertEqual(['1', '2'], list(combo_df.index.names))
+
+    def test_38_exact_face_counts(self):
+        """
+        Test the exact face count distribution and expectation of three fair dice against the binomial distribution
+        """
+        game = Game([Die(np.array([1, 2, 3, 4, 5, 6], dtype=np.int64)) for i in range(3)])
+        analyzer_bot = Analyzer(game)
+        expected = analyzer_bot.exact_face_counts()
+        np.testing.assert_allclose([0.5] * 6, expected.to_numpy())
+        np.testing.assert_allclose([125 / 216, 75 / 216, 15 / 216, 1 / 216], analyzer_bot.exact_face_counts_df[6].to_numpy())
+        game.play(200000, rng=9)
+        self.assertAlmostEqual(analyzer_bot.exact_jackpot(), analyzer_bot.jackpot() / 200000, places=2)
+
+    def test_39_play_until(self):
+        """
+        Test that play_until stops at the target relative error, keeps every roll and brackets the true jackpot rate
+        """
+        game = Game([Die(np.array([1, 2, 3, 4, 5, 6], dtype=np.int64)) for i in range(3)])
+        estimates = game.play_until(rel_error=0.05, batch_size=20000, top_combos=2, rng=3)
+        self.assertEqual('jackpot', estimates.index[0])
+        self.assertEqual(3, estimates.shape[0])
+        self.assertTrue((estimates['relative_error'] <= 0.05).all())
+        self.assertEqual(estimates['rolls'].iloc[0], game.show().shape[0])
+        self.assertEqual(0, estimates['rolls'].iloc[0] % 20000)
+        self.assertAlmostEqual(Analyzer(game).jackpot() / game.show().shape[0], estimates.loc['jackpot', 'estimate'])
+        self.assertTrue(estimates.loc['jackpot', 'lower'] < 1 / 36 < estimates.loc['jackpot', 'upper'])
+        capped = game.play_until(rel_error=0.0001, batch_size=1000, max_rolls=2500, rng=3)
+        self.assertEqual(2500, game.show().shape[0])
+        self.assertTrue(capped.loc['jackpot', 'relative_error'] > 0.0001)
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            self.assertIsNone(game.play_until(max_rolls=0))
+            self.assertEqual("Please pass a maximum number of rolls of at least 1", fake_out.getvalue().strip())
+        self.assertEqual(2500, game.show().shape[0])
+
+    def test_40_play_until_variance_reduction(self):
+        """
+        Test that stratified draws roll each face in proportion to its weight and antithetic draws mirror each other
+        """
+        d1 = Die(np.array([1, 2, 3, 4], dtype=np.int64))
+        d1.change_weight(4, 5.0)
+        game = Game([d1, Die(np.array([1, 2, 3, 4], dtype=np.int64))])
+        game.play_until(batch_size=800, max_rolls=800, variance_reduction='stratified', rng=5)
+        face_rolls = game.show()['1'].value_counts().sort_index().tolist()
+        self.assertEqual([100, 100, 100, 500], face_rolls)
+        self.assertEqual([200] * 4, game.show()['2'].value_counts().sort_index().tolist())
+        game.play_until(batch_size=800, max_rolls=800, variance_reduction='antithetic', rng=5)
+        rolls = game.show()['2'].to_numpy()
+        self.assertTrue(((rolls[:400] + rolls[400:]) == 5).all())
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            self.assertIsNone(game.play_until(variance_reduction='control'))
+            self.assertEqual("Please pass a variance reduction of None, 'antithetic' or 'stratified'",
+                             fake_out.getvalue().strip())
+
+    def test_41_sweep(self):
+        """
+        Test that a sweep plays one game per weight configuration, reproducibly for any number of workers
+        """
+        weights = np.array([[1.0, 0.0, 0.0], [1.0, 1.0, 1.0], [0.0, 0.0, 2.0], [3.0, 1.0, 0.0]])
+        results = sweep(np.array([1, 2, 3], dtype=np.int64), weights, 3, 20000, seed=11)
+        self.assertEqual(['roll_count', 'jackpots', 'jackpot_rate', 'exact_jackpot'], results.columns.tolist())
+        self.assertEqual([0, 1, 2, 3], results.index.tolist())
+        self.assertEqual([20000, 20000], results['jackpots'].iloc[[0, 2]].tolist())
+        np.testing.assert_allclose([1.0, 1 / 9, 1.0, 0.4375], results['exact_jackpot'].to_numpy())
+        np.testing.assert_allclose(results['exact_jackpot'], results['jackpot_rate'], atol=0.01)
+        pd.testing.assert_frame_equal(results, sweep(np.array([1, 2, 3], dtype=np.int64), weights, 3, 20000,
+                                                     seed=11, workers=2))
+        chunked = sweep(np.arange(3), np.ones((4, 3)), 3, 200000, seed=11)
+        pd.testing.assert_frame_equal(chunked.iloc[:2], sweep(np.arange(3), np.ones((2, 3)), 3, 200000, seed=11))
+        many_faces = sweep(np.arange(20), np.ones((2, 20)), 2, 20000, seed=11)
+        np.testing.assert_allclose([0.05, 0.05], many_faces['jackpot_rate'].to_numpy(), atol=0.01)
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            self.assertIsNone(sweep(np.array([1, 2, 3]), np.ones((2, 4)), 3, 10))
+            self.assertEqual("Please pass one weight per face in each weight configuration", fake_out.getvalue().strip())
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            self.assertIsNone(sweep(np.array([1, 2, 3]), np.ones((2, 3)), 0, 10))
+            self.assertIsNone(sweep(np.array([1, 2, 3]), [[1.0, -1.0, 1.0], [1.0, 1.0, 1.0]], 3, 10))
+            self.assertIsNone(sweep(np.array([1, 2, 3]), [[1.0, np.nan, 1.0]], 3, 10))
+            self.assertEqual("Please pass a dice count of at least 1\n"
+                             + "Weight negative or not finite, please enter a non-negative weight\n" * 2,
+                             fake_out.getvalue())
+
+    def test_42_play_async(self):
+        """
+        Test that the async play and analyzer methods give the results of their blocking counterparts
+        and that a cancelled play leaves the previous results untouched
+        """
+        game = Game([Die(np.array([1, 2, 3], dtype=np.int64)) for i in range(3)])
+        asyncio.run(game.play_async(5000, chunk_size=700, rng=4))
+        np.testing.assert_array_equal(np.concatenate(list(game.play_iter(5000, chunk_size=700, rng=4))), game._codes)
+        analyzer_bot = Analyzer(game)
+        self.assertEqual(Analyzer(game).jackpot(), asyncio.run(analyzer_bot.jackpot_async()))
+        self.assertIs(analyzer_bot.jackpot_df, analyzer_bot._cache['jackpot_df'][1])
+        pd.testing.assert_frame_equal(Analyzer(game).combo(), asyncio.run(analyzer_bot.combo_async()))
+        pd.testing.assert_frame_equal(Analyzer(game).face_counts_per_roll(),
+                                      asyncio.run(analyzer_bot.face_counts_per_roll_async()))
+
+        async def cancelled_play():
+            task = asyncio.ensure_future(game.play_async(10 ** 9, chunk_size=1000))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        codes = game._codes
+        asyncio.run(cancelled_play())
+        self.assertIs(codes, game._codes)
+
+    def test_43_simulation_queue(self):
+        """
+        Test that concurrent requests for identical dice share one simulation while different dice do not
+        """
+        queue = SimulationQueue(chunk_size=1000)
+
+        async def requests():
+            fair = [Die(np.array([1, 2], dtype=np.int64)) for i in range(2)]
+            same = [Die(np.array([1, 2], dtype=np.int64)) for i in range(2)]
+            loaded = [Die(np.array([1, 2], dtype=np.int64)) for i in range(2)]
+            loaded[0].change_weight(1, 5.0)
+            return await asyncio.gather(queue.play(fair, 5000), queue.play(same, 5000), queue.play(loaded, 5000),
+                                        queue.jackpot(fair, 5000), queue.jackpot(same, 5000))
+
+        game_1, game_2, game_3, jackpots_1, jackpots_2 = asyncio.run(requests())
+        self.assertIs(game_1, game_2)
+        self.assertIsNot(game_1, game_3)
+        self.assertEqual(5000, game_1._codes.shape[0])
+        self.assertEqual(Analyzer(game_1).jackpot(), jackpots_1)
+        self.assertEqual(jackpots_1, jackpots_2)
+        self.assertEqual({}, queue._jobs)
+
+    def test_44_lazy_pandas(self):
+        """
+        Test that rolling dice and playing games does not import pandas, and that show does
+        """
+        script = ('import sys, numpy, montecarlo; game = montecarlo.Game([montecarlo.Die(numpy.arange(6))] * 3); '
+                  'game.play(100); game.play_iter(10); print("pandas" in sys.modules); game.show(); '
+                  'print("pandas" in sys.modules)')
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(['False', 'True'], result.stdout.split())
+
+    def test_45_stacked_dice_with_different_faces(self):
+        """
+        Test that dice with different faces and weights are rolled at once with the same rolls as one die at a time
+        """
+        d1 = Die(np.array([1, 2, 3], dtype=np.int64))
+        d1.change_weight(3, 2.0)
+        d2 = Die(np.array([2, 4], dtype=np.int64))
+        d2.change_weight(2, 0.0)
+        game = Game([d1, d2] * 100)
+        stacked = game._stacked_codes(2000, np.random.default_rng(8))
+        np.testing.assert_array_equal(game._dice_codes(2000, np.random.default_rng(8)), stacked)
+        game.play(2000, rng=8)
+        np.testing.assert_array_equal(stacked, game._codes)
+        self.assertEqual({4}, set(game.show()['2'].tolist()))
+        np.testing.assert_allclose(0.5, (game.show()['1'] == 3).mean(), atol=0.05)
+        coin = Die(np.array(['T', 'H']))
+        coin.change_weight('T', 3.0)
+        game = Game([coin, coin, Die(np.array([3, 1, 2], dtype=np.int64).astype(np.str_))])
+        with patch('montecarlo.BLOCK_ROWS', 100):
+            stacked = game._stacked_codes(500, np.random.default_rng(2))
+        np.testing.assert_array_equal(game._dice_codes(500, np.random.default_rng(2)), stacked)
+        np.testing.assert_array_equal(coin._faces[coin._roll_indices(500, np.random.default_rng(2))],
+                                      game._face_table[stacked[:, 0]])
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            Game([Die(np.array([1, 2])), coin])
+            self.assertEqual("Please pass dice whose faces are all numbers or all strings", fake_out.getvalue().strip())
+
+    def test_46_combo_sketch(self):
+        """
+        Test that the combo sketch finds the most frequent combinations of loaded dice within its error bounds
+        and estimates the number of distinct combinations
+        """
+        dice = []
+        for i in range(6):
+            dice.append(Die(np.arange(1, 11, dtype=np.int64)))
+            dice[i].change_weight(1, 20.0)
+        game = Game(dice)
+        game.play(50000, rng=12)
+        exact = Analyzer(game).combo()
+        sketch = ComboSketch(game, capacity=100, width=1 << 10)
+        for chunk in np.array_split(game._codes, 7):
+            sketch.update(chunk)
+        top = sketch.result(top_k=3)
+        self.assertEqual(['count', 'count_lower'], top.columns.tolist())
+        self.assertEqual(exact.index.names, top.index.names)
+        self.assertEqual((1, 1, 1, 1, 1, 1), top.index[top['count'].argmax()])
+        true_counts = exact.loc[top.index, 'count']
+        self.assertTrue((top['count_lower'] <= true_counts).all() and (true_counts <= top['count']).all())
+        self.assertTrue(exact['count'].drop(sketch.result().index).max() <= sketch.unlisted_max_count)
+        self.assertAlmostEqual(exact.shape[0], sketch.distinct_combos, delta=4 * sketch.distinct_combos_error * exact.shape[0])
+        analyzer_bot = Analyzer(game)
+        sketched = analyzer_bot.combo_sketch(top_k=3, capacity=100)
+        self.assertIs(sketched, analyzer_bot.combo_sketch_df)
+        true_counts = exact.loc[sketched.index, 'count']
+        self.assertTrue((sketched['count_lower'] <= true_counts).all() and (true_counts <= sketched['count']).all())
+
+    def test_47_narrow_from_codes(self):
+        """
+        Test that the narrow view lists the dice of each roll in die order without decoding or changing the wide view
+        """
+        game = Game([Die(np.array([1, 2, 3], dtype=np.int64)) for i in range(12)])
+        game.play(50, rng=6)
+        narrow = game.show(wide=False)
+        self.assertIsNone(game._wide)
+        self.assertIs(narrow, game.show(wide=False))
+        self.assertEqual([str(dice_number) for dice_number in range(1, 13)],
+                         narrow.loc[1].index.tolist())
+        wide = game.show()
+        self.assertEqual('roll_number', wide.index.name)
+        np.testing.assert_array_equal(wide.to_numpy().ravel(), narrow['face_value'].to_numpy())
+        self.assertEqual([1, 2, 3], narrow['face_value'].cat.categories.tolist())
+
+    def test_48_fenwick_sampler(self):
+        """
+        Test that the Fenwick sampler rolls like the cumulative weights, before and after weights are updated in place
+        """
+        fenwick_die = Die(np.arange(100, dtype=np.int64), sampler='fenwick')
+        cdf_die = Die(np.arange(100, dtype=np.int64), sampler='cdf')
+        weights = {face: float(face % 7) for face in range(100)}
+        for dice in (fenwick_die, cdf_die):
+            dice.change_weights(weights)
+            dice.roll(1)
+        for dice in (fenwick_die, cdf_die):
+            dice.change_weights({3: 50.0, 14: 0.0, 20: '2.5'})
+            dice.change_weight(99, 0)
+        self.assertIsNotNone(fenwick_die._tree)
+        for roll_count in (5, 5000):
+            np.testing.assert_array_equal(cdf_die.roll(roll_count, rng=3), fenwick_die.roll(roll_count, rng=3))
+        self.assertEqual([0.0, 2.5, 0.0], fenwick_die._w[[14, 20, 99]].tolist())
+        updated_tree = fenwick_die._tree.copy()
+        fenwick_die._tree = None
+        np.testing.assert_allclose(fenwick_die._fenwick_tree(), updated_tree)
+        self.assertNotIn(14, fenwick_die.roll(20000, rng=4).tolist())
+        small_die = Die(np.array([0, 1, 2], dtype=np.int64), sampler='fenwick')
+        small_die.change_weights({0: 0.1, 1: 0.2, 2: 0.3})
+        small_die.roll(5, rng=1)
+        small_die.change_weights({0: 0.0, 1: 0.0})
+        self.assertEqual({2}, set(small_die.roll(1000, rng=1).tolist()))
+        small_die.change_weight(2, 0.0)
+        with self.assertRaises(ValueError):
+            small_die.roll(5, rng=1)
+        signed_die = Die(np.arange(20, dtype=np.int64), sampler='fenwick')
+        signed_die.roll(1, rng=1)
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            signed_die.change_weights({5: -5.0, 6: float('nan')})
+            self.assertEqual("Weight negative or not finite, please enter a non-negative weight\n" * 2,
+                             fake_out.getvalue())
+        self.assertEqual(set(range(20)), set(signed_die.roll(5000, rng=2).tolist()))
+        self.assertEqual([1.0] * 20, signed_die._w.tolist())
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            fenwick_die.change_weights({1000: 1.0, 5: 'heavy'})
+            self.assertEqual("Face value not in dictionary\nWeight not numerical, please enter a numerical weight",
+                             fake_out.getvalue().strip())
+
+    def test_49_markov_die(self):
+        """
+        Test that a Markov die follows its transition weights in a single sequence and in chains rolled in lockstep
+        """
+        markov_die = MarkovDie(np.array(['H', 'T'], dtype=np.str_), transitions=[[1.0, 0.0], [1.0, 1.0]])
+        markov_die.change_weight('H', 0.0)
+        sequence = markov_die.roll(2000, rng=2)
+        self.assertEqual('T', sequence[0])
+        first_head = sequence.tolist().index('H')
+        self.assertEqual({'H'}, set(sequence[first_head:].tolist()))
+        markov_die.change_transition('H', 'T', 3.0)
+        chains = markov_die.roll_chains(20000, 6, rng=2)
+        self.assertEqual((20000, 6), chains.shape)
+        self.assertEqual({'T'}, set(chains[:, 0].tolist()))
+        follows_head = chains[:, 2][chains[:, 1] == 'H']
+        self.assertAlmostEqual(0.75, (follows_head == 'T').mean(), delta=0.02)
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            markov_die.change_transition('H', 'E', 1.0)
+            MarkovDie(np.array([1, 2, 3]), transitions=np.ones((2, 2)))
+            self.assertEqual("Face value not in dictionary\n"
+                             "Please pass a square matrix of transition weights with one row and one column per face",
+                             fake_out.getvalue().strip())
+
+    def test_50_markov_game(self):
+        """
+        Test that chained Markov dice make each roll of a game a sequence, with matching exact statistics,
+        and that they survive a save and load
+        """
+        markov_die = MarkovDie(np.array([1, 2, 3], dtype=np.int64),
+                               transitions=[[0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, 0.0, 0.0]])
+        game = Game([Die(np.array([1, 2, 3], dtype=np.int64)), markov_die, markov_die])
+        game.play(3000, rng=5)
+        rolls = game.show().to_numpy()
+        np.testing.assert_array_equal(rolls[:, 0] % 3 + 1, rolls[:, 1])
+        np.testing.assert_array_equal(rolls[:, 1] % 3 + 1, rolls[:, 2])
+        analyzer_bot = Analyzer(game)
+        self.assertEqual(0, analyzer_bot.jackpot())
+        self.assertEqual(0.0, analyzer_bot.exact_jackpot())
+        self.assertEqual([(1, 2, 3), (2, 3, 1), (3, 1, 2)], analyzer_bot.exact_combo().index.tolist())
+        np.testing.assert_allclose([1.0, 1.0, 1.0], analyzer_bot.exact_face_counts().to_numpy())
+        np.testing.assert_allclose([0.0, 1.0, 0.0, 0.0], analyzer_bot.exact_face_counts_df[2].to_numpy())
+        with tempfile.TemporaryDirectory() as path:
+            game.save(path)
+            loaded = Game.load(path, mmap=False)
+            self.assertIsInstance(loaded._dice_list[1], MarkovDie)
+            loaded.play(100, rng=1)
+            self.assertEqual(0, Analyzer(loaded).jackpot())
+        queue = SimulationQueue(chunk_size=500)
+
+        async def requests():
+            stay = MarkovDie(np.array([1, 2], dtype=np.int64), transitions=[[1.0, 0.0], [0.0, 1.0]])
+            swap = MarkovDie(np.array([1, 2], dtype=np.int64), transitions=[[0.0, 1.0], [1.0, 0.0]])
+            return await asyncio.gather(queue.jackpot([stay, stay], 1000), queue.jackpot([swap, swap], 1000))
+
+        self.assertEqual([1000, 0], asyncio.run(requests()))
+
+    def test_51_game_summary(self):
+        """
+        Test that merged summaries of separately played shards give the statistics of the Analyzer on all of the rolls,
+        that merging is associative, and that summaries survive pickling and a save and load
+        """
+        dice = [Die(np.array([1, 2, 3], dtype=np.int64)) for i in range(3)]
+        shards = []
+        for seed in range(3):
+            game = Game(dice)
+            game.play(2000, rng=seed)
+            shards.append(game)
+        whole = Game(dice)
+        whole._store(np.concatenate([shard._codes for shard in shards]))
+        analyzer_bot = Analyzer(whole)
+        first, second, third = [shard.summary() for shard in shards]
+        merged = first.merge(second).merge(third)
+        self.assertEqual(6000, merged.roll_count)
+        self.assertEqual(analyzer_bot.jackpot(), merged.jackpot())
+        pd.testing.assert_frame_equal(analyzer_bot.combo(), merged.combo())
+        np.testing.assert_array_equal(analyzer_bot.face_counts_per_roll().sum().to_numpy(),
+                                      merged.face_totals().to_numpy())
+        pd.testing.assert_frame_equal(merged.face_counts(), first.merge(second.merge(third)).face_counts())
+        restored = pickle.loads(pickle.dumps(merged))
+        pd.testing.assert_frame_equal(merged.combo(), restored.combo())
+        with tempfile.TemporaryDirectory() as path:
+            merged.save(os.path.join(path, 'summary.npz'))
+            loaded = GameSummary.load(os.path.join(path, 'summary.npz'))
+        self.assertEqual(6000, loaded.roll_count)
+        pd.testing.assert_frame_equal(merged.face_counts(), loaded.face_counts())
+        with tempfile.TemporaryDirectory() as path:
+            with patch('montecarlo.SAVE_FORMAT_VERSION', 2):
+                merged.save(os.path.join(path, 'summary.npz'))
+            with self.assertRaises(ValueError):
+                GameSummary.load(os.path.join(path, 'summary.npz'))
+        unplayed = Game(dice).summary()
+        self.assertEqual(0, unplayed.roll_count)
+        self.assertEqual(6000, unplayed.merge(merged).roll_count)
+        pd.testing.assert_frame_equal(merged.combo(), unplayed.merge(merged).combo())
+
+    def test_52_game_summary_faces(self):
+        """
+        Test that summaries of games with different faces merge over all the faces,
+        and that summaries of games with different numbers of dice do not merge
+        """
+        low = Game([Die(np.array([1, 2], dtype=np.int64)) for i in range(2)])
+        low.play(500, rng=1)
+        high = Game([Die(np.array([2, 3], dtype=np.int64)) for i in range(2)])
+        high.play(500, rng=2)
+        merged = low.summary().merge(high.summary())
+        self.assertEqual([1, 2, 3], merged.face_totals().index.tolist())
+        self.assertEqual(2000, merged.face_totals().sum())
+        self.assertEqual(low.summary().jackpot() + high.summary().jackpot(), merged.jackpot())
+        three = Game([Die(np.array([1, 2], dtype=np.int64)) for i in range(3)])
+        three.play(10, rng=1)
+        with self.assertRaises(ValueError):
+            merged.merge(three.summary())
+
 
 if __name__ == '__main__':
     u.main(verbosity=3)